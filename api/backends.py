@@ -0,0 +1,248 @@
+import importlib
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+import dsp
+import models
+import config
+
+
+class Backend:
+    """Интерфейс синтеза для языка.
+
+    Реализации регистрируются в config.BACKENDS и импортируются при первом
+    запросе языка; тяжёлые зависимости (TTS, transformers, onnxruntime)
+    подгружаются в load.
+    """
+    sample_rate = 24000
+    # Максимальная длина фрагмента текста за один вызов модели
+    max_chars = 250
+    # Сколько предложений запроса pipeline передаёт в synthesize_batch разом
+    batch_size = 1
+
+    def __init__(self, lang, cfg):
+        self.lang = lang
+        self.cfg = cfg
+        self.max_chars = cfg.get('max_chars', self.max_chars)
+
+    def load(self, voice='default', quantized=False):
+        """Загрузка модели (кэшируется в models), возвращает её"""
+        raise NotImplementedError
+
+    def prefetch(self, voice='default', quantized=None):
+        """Фоновая загрузка (в т.ч. после выгрузки), пока запрос ждёт в очереди"""
+        if quantized is None:
+            quantized = self.cfg['quantize']
+        return _prefetch.submit(self.load, voice, quantized)
+
+    def synthesize_batch(self, texts, voice='default', quantized=False, speed=1.0):
+        """Синтез списка фрагментов, каждый не длиннее max_chars
+        :return: список сигналов float в порядке texts
+        """
+        raise NotImplementedError
+
+    def synthesize_stream(self, text, voice='default', quantized=False, speed=1.0):
+        """Синтез одного фрагмента частями по мере готовности (по умолчанию - одной частью)"""
+        yield from self.synthesize_batch([text], voice, quantized, speed)
+
+
+class XTTSBackend(Backend):
+    sample_rate = 24000
+    batch_size = config.XTTS_BATCH_SIZE
+    # Ограничения токенизатора XTTS v2 по языкам
+    CHAR_LIMITS = {'en': 250, 'ru': 182, 'it': 213, 'fr': 273, 'ja': 71, 'zh-cn': 82}
+
+    def __init__(self, lang, cfg):
+        super().__init__(lang, cfg)
+        self.max_chars = cfg.get('max_chars', self.CHAR_LIMITS.get(lang, 182))
+        self._latents = {}
+
+    def _conditioning(self, tts, voice, quantized):
+        # латенты голоса считаются один раз, а не на каждое предложение
+        key = (voice, quantized)
+        if key not in self._latents:
+            self._latents[key] = tts.synthesizer.tts_model.get_conditioning_latents(
+                audio_path=[config.VOICES[voice]])
+        return self._latents[key]
+
+    def load(self, voice='default', quantized=False):
+        return models.get_xtts(quantized)
+
+    def synthesize_batch(self, texts, voice='default', quantized=False, speed=1.0):
+        tts = self.load(voice, quantized)
+        with infer_lock(tts.synthesizer.tts_model):
+            if self.batch_size <= 1 or len(texts) == 1:
+                speaker_wav = config.VOICES[voice]
+                return [tts.tts(text=s, speaker_wav=speaker_wav, language=self.lang, speed=speed) for s in texts]
+            gpt_cond_latent, speaker_embedding = self._conditioning(tts, voice, quantized)
+            result = []
+            for i in range(0, len(texts), self.batch_size):
+                result += self._infer_batch(tts.synthesizer.tts_model, texts[i:i + self.batch_size],
+                                            gpt_cond_latent, speaker_embedding, speed)
+            return result
+
+    def _infer_batch(self, model, texts, gpt_cond_latent, speaker_embedding, speed):
+        """Один проход GPT и HiFi-GAN для нескольких фрагментов с общим латентом голоса.
+
+        Префиксы (латент голоса + текст) выравниваются паддингом слева с маской
+        внимания, коды и латенты - справа; каждый сигнал обрезается по своей длине.
+        Повторяет Xtts.inference для batch size 1.
+        """
+        import torch.nn.functional as F
+        gpt = model.gpt
+        cfg = model.config
+        device = model.device
+        batch = len(texts)
+        language = self.lang.split('-')[0]
+        tokens = [torch.IntTensor(model.tokenizer.encode(s.strip().lower(), lang=language)).to(device) for s in texts]
+        cond = gpt_cond_latent.to(device)
+        with torch.no_grad():
+            prefixes = []
+            for t in tokens:
+                t = F.pad(F.pad(t.unsqueeze(0), (0, 1), value=gpt.stop_text_token), (1, 0), value=gpt.start_text_token)
+                prefixes.append(torch.cat([cond, gpt.text_embedding(t) + gpt.text_pos_embedding(t)], dim=1)[0])
+            width = max(p.shape[0] for p in prefixes)
+            gpt.gpt_inference.store_prefix_emb(torch.stack([F.pad(p, (0, 0, width - p.shape[0], 0)) for p in prefixes]))
+            mask = torch.zeros((batch, width + 1), dtype=torch.long, device=device)
+            for b, p in enumerate(prefixes):
+                mask[b, width - p.shape[0]:] = 1
+            inputs = torch.ones((batch, width + 1), dtype=torch.long, device=device)
+            inputs[:, -1] = gpt.start_audio_token
+            codes = gpt.gpt_inference.generate(
+                inputs,
+                attention_mask=mask,
+                bos_token_id=gpt.start_audio_token,
+                pad_token_id=gpt.stop_audio_token,
+                eos_token_id=gpt.stop_audio_token,
+                max_length=gpt.max_gen_mel_tokens + inputs.shape[-1],
+                do_sample=True,
+                top_p=cfg.top_p,
+                top_k=cfg.top_k,
+                temperature=cfg.temperature,
+                num_return_sequences=1,
+                num_beams=1,
+                length_penalty=cfg.length_penalty,
+                repetition_penalty=cfg.repetition_penalty,
+            )[:, inputs.shape[1]:]
+
+            # длина кодов фрагмента - до первого stop токена
+            stop = codes == gpt.stop_audio_token
+            code_lens = torch.where(stop.any(1), stop.int().argmax(1), torch.full_like(stop[:, 0], codes.shape[1], dtype=torch.long))
+            text_lens = torch.tensor([t.shape[0] for t in tokens], device=device)
+            text_inputs = torch.stack([F.pad(t, (0, int(text_lens.max()) - t.shape[0]), value=gpt.stop_text_token) for t in tokens])
+            latents = gpt(
+                text_inputs, text_lens, codes, code_lens * gpt.code_stride_len,
+                cond_latents=cond.expand(batch, -1, -1), return_attentions=False, return_latent=True,
+            )
+            length_scale = 1.0 / max(speed, 0.05)
+            if length_scale != 1.0:
+                latents = F.interpolate(latents.transpose(1, 2), scale_factor=length_scale, mode="linear").transpose(1, 2)
+            wavs = model.hifigan_decoder(latents, g=speaker_embedding.to(device).expand(batch, -1, -1))
+        samples_per_latent = wavs.shape[-1] / latents.shape[1]
+        return [wavs[b].squeeze()[:int(code_lens[b] * length_scale * samples_per_latent)].cpu().tolist()
+                for b in range(batch)]
+
+    def synthesize_stream(self, text, voice='default', quantized=False, speed=1.0):
+        """Инкрементальный вывод XTTS: части аудио отдаются, пока GPT ещё генерирует.
+        Размер части и перекрытие для кроссфейда - config.XTTS_STREAM_CHUNK и XTTS_STREAM_OVERLAP
+        """
+        tts = self.load(voice, quantized)
+        model = tts.synthesizer.tts_model
+        lock = infer_lock(model)
+        with lock:
+            gpt_cond_latent, speaker_embedding = self._conditioning(tts, voice, quantized)
+        chunks = model.inference_stream(
+            text, self.lang, gpt_cond_latent, speaker_embedding,
+            stream_chunk_size=config.XTTS_STREAM_CHUNK,
+            overlap_wav_len=config.XTTS_STREAM_OVERLAP,
+            speed=speed,
+            enable_text_splitting=False,
+        )
+        prefix = None
+        while True:
+            # Между частями модель обслуживает другие задачи, и их префикс
+            # перезаписывает cached_prefix_emb, по длине которого GPT ставит
+            # позиции mel токенов. Свой префикс восстанавливаем перед каждым шагом
+            with lock:
+                if prefix is not None:
+                    model.gpt.gpt_inference.store_prefix_emb(prefix)
+                chunk = next(chunks, None)
+                prefix = model.gpt.gpt_inference.cached_prefix_emb
+            if chunk is None:
+                return
+            yield chunk.squeeze().cpu().tolist()
+
+
+class VitsBackend(Backend):
+    sample_rate = 16000
+    max_chars = 400
+
+    def load(self, voice='default', quantized=False):
+        return models.get_vits(self.cfg['model'], quantized)
+
+    def synthesize_batch(self, texts, voice='default', quantized=False, speed=1.0):
+        model, tokenizer = self.load(voice, quantized)
+        result = []
+        for s in texts:
+            input_ids = tokenizer(s, return_tensors="pt")["input_ids"].to(config.DEVICE)
+            # speaking_rate читается в forward, поэтому меняется только под замком модели
+            with infer_lock(model), torch.no_grad():
+                model.speaking_rate = speed
+                result.append(model(input_ids).waveform[0].cpu().tolist())
+        return result
+
+
+class VitsOnnxBackend(VitsBackend):
+    def load(self, voice='default', quantized=False):
+        return models.get_vits_onnx(self.cfg['model'])
+
+    def synthesize_batch(self, texts, voice='default', quantized=False, speed=1.0):
+        import onnx_backend
+        session, tokenizer = self.load(voice, quantized)
+        result = []
+        for s in texts:
+            wav = onnx_backend.infer(session, tokenizer(s, return_tensors="pt")["input_ids"])[0]
+            # speaking_rate зашит в граф при экспорте, темп меняем после синтеза
+            result.append(dsp.time_stretch(wav, speed).tolist())
+        return result
+
+
+class FakeBackend(Backend):
+    sample_rate = 24000
+    max_chars = 1000
+
+    def load(self, voice='default', quantized=False):
+        return None
+
+    def synthesize_batch(self, texts, voice='default', quantized=False, speed=1.0):
+        import fake_backend
+        return [fake_backend.synth(s, self.sample_rate, speed) for s in texts]
+
+
+_backends = {}
+_lock = threading.Lock()
+_infer_locks = weakref.WeakKeyDictionary()
+# один поток: фоновые загрузки не складывают пики памяти
+_prefetch = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+
+def infer_lock(model):
+    """Замок модели: вызовы одной модели из разных потоков идут по очереди"""
+    with _lock:
+        return _infer_locks.setdefault(model, threading.Lock())
+
+
+def get(lang):
+    """Бэкенд языка; класс импортируется при первом обращении"""
+    config.check_lang(lang)
+    with _lock:
+        if lang not in _backends:
+            cfg = config.lang_config(lang)
+            path = config.BACKENDS.get(cfg['backend'], cfg['backend'])
+            module, name = path.rsplit('.', 1)
+            cls = getattr(importlib.import_module(module), name)
+            _backends[lang] = cls(lang, cfg)
+        return _backends[lang]
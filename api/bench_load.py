@@ -0,0 +1,165 @@
+"""Нагрузочный бенчмарк /api/tts.
+
+Отправляет объявления из corpus.py с заданной параллельностью и выводит
+пропускную способность, p50/p95/p99 задержки, время до первого байта и
+real-time factor. Корпус идёт по кругу; чтобы со второго круга мерить синтез,
+а не кэш ответов и объединение запросов, к тексту добавляется номер круга
+(--repeat-texts отключает). Ответы из кэша и общие синтезы (заголовок X-Cache)
+считаются отдельно, latency_miss - только по собственным синтезам. С --fake поднимает сервер с детерминированной заменой
+модели (TTS_FAKE_BACKEND=1), чтобы мерить сервер, очередь и постобработку
+без весов моделей, например в CI.
+
+    $ python bench_load.py --fake --concurrency 8 --requests 200 --out load.json
+    $ python bench_load.py --url http://10.0.0.5:9001 --langs ru,en --concurrency 4
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import httpx
+import numpy as np
+
+from corpus import ANNOUNCEMENTS
+
+
+async def one_request(client, url, text, lang):
+    t0 = time.perf_counter()
+    ttfb = None
+    body = b''
+    async with client.stream('POST', f'{url}/api/tts', json={'text': text}, params={'lang': lang}) as response:
+        async for chunk in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - t0
+            body += chunk
+        status = response.status_code
+        cache = response.headers.get('X-Cache')
+    latency = time.perf_counter() - t0
+    duration = 0.0
+    if status == 200:
+        with wave.open(io.BytesIO(body)) as w:
+            duration = w.getnframes() / w.getframerate()
+    return {'lang': lang, 'status': status, 'latency': latency, 'ttfb': ttfb or latency, 'audio': duration,
+            'cache': cache}
+
+
+def texts(langs, total, repeat=False):
+    """(текст, язык) по кругу корпуса; с repeat=False тексты разных кругов различаются"""
+    corpus = [(text, lang) for lang in langs for text in ANNOUNCEMENTS[lang]]
+    for i in range(total):
+        text, lang = corpus[i % len(corpus)]
+        n = i // len(corpus)
+        if n and not repeat:
+            text = f'{text} {n}.'
+        yield text, lang
+
+
+async def run(url, langs, concurrency, total, repeat=False):
+    jobs = texts(langs, total, repeat)
+    results = []
+    lock = asyncio.Lock()
+
+    async def worker(client):
+        while True:
+            async with lock:
+                job = next(jobs, None)
+            if job is None:
+                return
+            try:
+                results.append(await one_request(client, url, *job))
+            except httpx.HTTPError as e:
+                results.append({'lang': job[1], 'status': type(e).__name__, 'latency': 0, 'ttfb': 0, 'audio': 0,
+                                'cache': None})
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(600.0), limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        wall = time.perf_counter() - t0
+    return results, wall
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    return {f'p{p}': float(np.percentile(values, p)) for p in (50, 95, 99)}
+
+
+def report(results, wall, concurrency):
+    ok = [r for r in results if r['status'] == 200]
+    errors = {}
+    for r in results:
+        if r['status'] != 200:
+            errors[str(r['status'])] = errors.get(str(r['status']), 0) + 1
+    audio = sum(r['audio'] for r in ok)
+    cache = {}
+    for r in ok:
+        cache[str(r['cache'])] = cache.get(str(r['cache']), 0) + 1
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': len(ok),
+        'errors': errors,
+        'wall_s': wall,
+        'throughput_rps': len(ok) / wall,
+        'audio_s_per_s': audio / wall,
+        'cache': cache,
+        'latency': percentiles([r['latency'] for r in ok]),
+        'latency_miss': percentiles([r['latency'] for r in ok if r['cache'] == 'miss']),
+        'ttfb': percentiles([r['ttfb'] for r in ok]),
+        'rtf': percentiles([r['latency'] / r['audio'] for r in ok if r['audio']]),
+    }
+
+
+def start_fake_server(port, rtf):
+    env = dict(os.environ, TTS_FAKE_BACKEND='1', TTS_FAKE_RTF=str(rtf))
+    proc = subprocess.Popen([sys.executable, 'server.py', '--port', str(port)], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(600):
+        try:
+            if httpx.get(f'{url}/api/ready').status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError('Сервер не запустился')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("bench_load")
+    parser.add_argument("--url", default='http://127.0.0.1:9001', help="адрес сервера")
+    parser.add_argument("--fake", action='store_true', help="запустить сервер с fake моделью")
+    parser.add_argument("--fake-rtf", type=float, default=0.3, help="скорость fake модели")
+    parser.add_argument("--port", type=int, default=9011, help="порт сервера для --fake")
+    parser.add_argument("--langs", default=','.join(ANNOUNCEMENTS), help="языки через запятую")
+    parser.add_argument("--concurrency", type=int, default=4, help="параллельные запросы")
+    parser.add_argument("--requests", type=int, default=50, help="всего запросов")
+    parser.add_argument("--repeat-texts", action='store_true',
+                        help="повторять тексты корпуса как есть (мерить кэш ответов)")
+    parser.add_argument("--out", default=None, help="json файл с результатами")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if args.fake:
+        proc, url = start_fake_server(args.port, args.fake_rtf)
+    try:
+        results, wall = asyncio.run(run(url, args.langs.split(','), args.concurrency, args.requests,
+                                       args.repeat_texts))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    summary = report(results, wall, args.concurrency)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'requests': results}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,110 @@
+"""Микробенчмарки текстовой предобработки и DSP.
+
+Меряет prep0, prep, number_to_words, filter.compres, filter1-filter4 и
+dsp.resample на входах от короткого объявления до
+документа в 5000 символов и от 1 до 120 секунд аудио.
+
+    $ python bench_micro.py --save bench_baseline.json
+    $ python bench_micro.py --compare bench_baseline.json --threshold 0.15
+
+В режиме --compare код выхода 1, если медиана хотя бы одного замера выросла
+больше чем на threshold относительно базовой.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+from preprocessing import prep0, prep, number_to_words
+from filter import compres, filter1, filter2, filter3, filter4
+from corpus import ANNOUNCEMENTS
+from dsp import resample
+
+SAMPLE_RATE = 24000
+
+
+def texts():
+    words10 = "Уважаемые пассажиры рейса 10 16 выход номер 120 посадка окончена."
+    doc = ' '.join(ANNOUNCEMENTS['ru'])
+    doc5000 = (doc * (5000 // len(doc) + 1))[:5000]
+    return {'10w': words10, f'{len(doc)}c': doc, '5000c': doc5000}
+
+
+def audio(seconds):
+    rng = np.random.default_rng(0)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 180 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def cases(quick):
+    for name, text in texts().items():
+        yield f'prep0[{name}]', lambda text=text: prep0(text)
+        prepared = prep0(text)
+        yield f'prep[{name}]', lambda prepared=prepared: prep(prepared, 'ru')
+    numbers = list(range(0, 10000, 7))
+    for lang in ('ru', 'en', 'fr'):
+        yield f'number_to_words[{lang},{len(numbers)}]', lambda lang=lang: [number_to_words(n, lang) for n in numbers]
+
+    for seconds in ((1, 10) if quick else (1, 10, 120)):
+        wav = audio(seconds)
+        as_list = wav.tolist()
+        tensor = torch.from_numpy(wav)
+        yield f'compres[{seconds}s,list]', lambda as_list=as_list: compres(as_list, SAMPLE_RATE)
+        yield f'compres[{seconds}s,ndarray]', lambda wav=wav: compres(wav, SAMPLE_RATE)
+        for fn in (filter1, filter2, filter3, filter4):
+            yield f'{fn.__name__}[{seconds}s]', lambda fn=fn, tensor=tensor: fn(tensor, SAMPLE_RATE)
+        for target in (8000, 16000, 48000):
+            yield f'resample[{seconds}s,{target}]', lambda wav=wav, target=target: resample(wav, SAMPLE_RATE, target)
+
+
+def measure(fn, repeat):
+    # подбираем число вызовов так, чтобы один замер шёл не меньше 0.2 с
+    number, _ = timeit.Timer(fn).autorange()
+    times = timeit.repeat(fn, number=number, repeat=repeat)
+    per_call = sorted(t / number for t in times)
+    return {'median_s': per_call[len(per_call) // 2], 'min_s': per_call[0], 'number': number}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, r in results.items():
+        if name not in baseline['results']:
+            continue
+        ratio = r['median_s'] / baseline['results'][name]['median_s']
+        mark = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{name:40} {baseline['results'][name]['median_s'] * 1e3:10.3f} {r['median_s'] * 1e3:10.3f} ms {ratio:6.2f}x {mark}")
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("bench_micro")
+    parser.add_argument("--save", default=None, help="записать результаты как базовые")
+    parser.add_argument("--compare", default=None, help="сравнить с базовыми результатами")
+    parser.add_argument("--threshold", type=float, default=0.15, help="допустимый рост медианы")
+    parser.add_argument("--repeat", type=int, default=5, help="число замеров")
+    parser.add_argument("--filter", default='', help="только замеры, содержащие строку")
+    parser.add_argument("--quick", action='store_true', help="без 120 с аудио")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases(args.quick):
+        if args.filter in name:
+            results[name] = measure(fn, args.repeat)
+            if not args.compare:
+                print(f"{name:40} {results[name]['median_s'] * 1e3:10.3f} ms")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'results': results}, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
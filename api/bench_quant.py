@@ -0,0 +1,92 @@
+"""Сравнение int8 и fp32 моделей по скорости и качеству.
+
+Для каждого языка синтезирует одни и те же фразы обеими моделями и выводит
+время синтеза, real-time factor и расстояние между MFCC (MCD с DTW).
+Чем меньше MCD, тем ближе звучание int8 к fp32. fp32 и int8 синтезируются с
+одним seed; ориентир для XTTS (сэмплирование GPT) - разброс между запусками
+fp32 с разными seed (колонка mcd_fp32).
+
+    $ python bench_quant.py --langs ru,kaz,grc --out quant.json
+"""
+import argparse
+import json
+import time
+
+import librosa
+import numpy as np
+import torch
+
+from pipeline import synthesize
+import config
+
+TEXTS = {
+    'ru': "Уважаемые пассажиры! Информационное табло и телемониторы, находящиеся в терминале, по техническим причинам временно не работают.",
+    'en': "Dear passengers, boarding for flight 1016 to Kaliningrad will begin in a few minutes at gate 120.",
+    'it': "Gentili passeggeri, l'imbarco del volo 1016 per Kaliningrad inizierà tra pochi minuti.",
+    'fr': "Chers passagers, l'embarquement du vol 1016 à destination de Kaliningrad commencera dans quelques minutes.",
+    'ja': "乗客の皆様、カリーニングラード行きの便はまもなく搭乗を開始いたします。",
+    'zh-cn': "尊敬的旅客，前往加里宁格勒的航班即将开始登机。",
+    'kaz': "Құрметті жолаушылар, Калининградқа ұшатын рейске отырғызу бірнеше минуттан кейін басталады.",
+    'grc': "Ὦ ἄνδρες, ἡ ναῦς ὀλίγον ὕστερον ἀναχωρήσει.",
+}
+
+
+def mcd(a, b, sample_rate):
+    """Mel-cepstral distortion между двумя записями разной длины"""
+    ma = librosa.feature.mfcc(y=np.asarray(a, dtype=np.float32), sr=sample_rate, n_mfcc=13)[1:]
+    mb = librosa.feature.mfcc(y=np.asarray(b, dtype=np.float32), sr=sample_rate, n_mfcc=13)[1:]
+    _, path = librosa.sequence.dtw(ma, mb)
+    diff = ma[:, path[:, 0]] - mb[:, path[:, 1]]
+    return float(10 / np.log(10) * np.sqrt(2) * np.mean(np.sqrt((diff ** 2).sum(axis=0))))
+
+
+def run(text, lang, quantized, repeat, seed=0):
+    times = []
+    audio, sample_rate = [], 0
+    for _ in range(repeat):
+        torch.manual_seed(seed)
+        t0 = time.perf_counter()
+        audio, sample_rate = synthesize(text, lang, quantized=quantized)
+        times.append(time.perf_counter() - t0)
+    return audio, sample_rate, float(np.median(times))
+
+
+def compare(lang, repeat):
+    text = TEXTS.get(lang, TEXTS['en'])
+    # первый вызов загружает модель и не учитывается
+    synthesize(text, lang, quantized=False)
+    synthesize(text, lang, quantized=True)
+
+    ref, sample_rate, t_fp32 = run(text, lang, False, repeat)
+    # другой seed: с тем же результат совпал бы с ref побитно
+    ref2, _, _ = run(text, lang, False, 1, seed=1)
+    q, _, t_int8 = run(text, lang, True, repeat)
+    duration = len(ref) / sample_rate
+    return {
+        'lang': lang,
+        'backend': config.lang_config(lang)['backend'],
+        'fp32_s': t_fp32,
+        'int8_s': t_int8,
+        'speedup': t_fp32 / t_int8,
+        'rtf_fp32': t_fp32 / duration,
+        'rtf_int8': t_int8 / (len(q) / sample_rate),
+        'mcd_int8': mcd(ref, q, sample_rate),
+        'mcd_fp32': mcd(ref, ref2, sample_rate),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("bench_quant")
+    parser.add_argument("--langs", default=','.join(config.LANGS), help="языки через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов")
+    parser.add_argument("--out", default=None, help="json файл с результатами")
+    args = parser.parse_args()
+
+    results = [compare(lang, args.repeat) for lang in args.langs.split(',')]
+    print(f"{'lang':6} {'fp32,s':>8} {'int8,s':>8} {'speedup':>8} {'rtf32':>6} {'rtf8':>6} {'mcd8':>6} {'mcd32':>6}")
+    for r in results:
+        print(f"{r['lang']:6} {r['fp32_s']:8.2f} {r['int8_s']:8.2f} {r['speedup']:8.2f} "
+              f"{r['rtf_fp32']:6.2f} {r['rtf_int8']:6.2f} {r['mcd_int8']:6.2f} {r['mcd_fp32']:6.2f}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,55 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+import config
+
+
+def key(text, lang, voice='default', **options):
+    """Ключ кэша: текст без лишних пробелов, язык, голос, модель и опции"""
+    text = ' '.join(text.split())
+    cfg = config.lang_config(lang)
+    parts = [text, lang, voice, cfg['backend'], str(cfg['quantize'])]
+    parts += [f'{k}={options[k]}' for k in sorted(options)]
+    return hashlib.sha1('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """LRU кэш синтезированного аудио (float32) с лимитом по памяти"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, k):
+        with self._lock:
+            item = self._items.get(k)
+            if item is not None:
+                self._items.move_to_end(k)
+        metrics.cache('response', item is not None)
+        return item
+
+    def put(self, k, audio, sample_rate):
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if k in self._items:
+                self._size -= self._items.pop(k)[0].nbytes
+            self._items[k] = (audio, sample_rate)
+            self._size += audio.nbytes
+            while self._size > self.max_bytes:
+                _, (old, _) = self._items.popitem(last=False)
+                self._size -= old.nbytes
+
+    def __contains__(self, k):
+        with self._lock:
+            return k in self._items
+
+
+responses = AudioCache(config.CACHE_MAX_MB * 1024 * 1024)
@@ -1,35 +1,225 @@
+import asyncio
 import requests
+import httpx
 from loguru import logger
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 import snappy
 import io
+import wave
+import numpy as np
 from pydub import AudioSegment
 
+
+def decode(content: bytes, content_type: str, as_numpy: bool = False):
+    """Декодирование ответа /api/tts в памяти
+    :param content: тело ответа
+    :param content_type: заголовок Content-Type
+    :param as_numpy: вернуть (np.ndarray float32, sample_rate) вместо AudioSegment
+    """
+    if content_type == 'application/octet-stream':
+        content = snappy.uncompress(content)
+    if not as_numpy:
+        return AudioSegment.from_file(io.BytesIO(content), format="wav")
+    with wave.open(io.BytesIO(content)) as w:
+        sample_rate = w.getframerate()
+        frames = w.readframes(w.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768, sample_rate
+
+
+class PCMFramer:
+    """Инкрементальный разбор WAV потока в кадры float32 фиксированного размера
+
+    framer = PCMFramer(1024)
+    for chunk in chunks:
+        for frame in framer.feed(chunk):
+            play(frame, framer.sample_rate)
+    tail = framer.flush()
+    """
+
+    def __init__(self, frame_size: int = 1024):
+        self.frame_size = frame_size
+        self.sample_rate = None
+        self._header = b''
+        self._pcm = bytearray()
+
+    def _parse_header(self):
+        # RIFF заголовок и чанки до 'data'; True, когда дошли до PCM
+        buf = self._header
+        if len(buf) < 12:
+            return False
+        if buf[:4] != b'RIFF' or buf[8:12] != b'WAVE':
+            raise RuntimeError('Response is not a WAV stream')
+        pos = 12
+        while len(buf) >= pos + 8:
+            chunk_id = buf[pos:pos + 4]
+            chunk_size = int.from_bytes(buf[pos + 4:pos + 8], 'little')
+            if chunk_id == b'data':
+                self._pcm += buf[pos + 8:]
+                self._header = None
+                return True
+            if len(buf) < pos + 8 + chunk_size:
+                return False
+            if chunk_id == b'fmt ':
+                fmt = buf[pos + 8:pos + 8 + chunk_size]
+                if int.from_bytes(fmt[0:2], 'little') != 1 or int.from_bytes(fmt[14:16], 'little') != 16:
+                    raise RuntimeError('Only 16-bit PCM WAV is supported')
+                self.sample_rate = int.from_bytes(fmt[4:8], 'little')
+            pos += 8 + chunk_size + chunk_size % 2
+        return False
+
+    def feed(self, chunk: bytes):
+        if self._header is not None:
+            self._header += chunk
+            if not self._parse_header():
+                return []
+        else:
+            self._pcm += chunk
+        frames = []
+        frame_bytes = self.frame_size * 2
+        n = len(self._pcm) // frame_bytes * frame_bytes
+        if n:
+            samples = np.frombuffer(bytes(self._pcm[:n]), dtype=np.int16).astype(np.float32) / 32768
+            frames = list(samples.reshape(-1, self.frame_size))
+            del self._pcm[:n]
+        return frames
+
+    def flush(self):
+        """Остаток короче frame_size (или None)"""
+        n = len(self._pcm) // 2 * 2
+        if not n:
+            return None
+        tail = np.frombuffer(bytes(self._pcm[:n]), dtype=np.int16).astype(np.float32) / 32768
+        self._pcm.clear()
+        return tail
+
+
+class TTSClient:
+    """Клиент /api/tts с пулом постоянных соединений
+
+    with TTSClient('10.0.0.5:9001') as client:
+        audio = client.predict("Уважаемые пассажиры!", 'ru')
+        audios = client.predict_many(texts, 'ru', concurrency=4)
+    """
+
+    def __init__(self, server_ip: str = '0.0.0.0:9001', pool_size: int = 10, timeout: float = 600.0):
+        self.url = f'http://{server_ip}/api/tts'
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def predict(self, data0: str, lang: str, as_numpy: bool = False, **params):
+        """
+        :param data0: string for translate into audio
+        :param lang: language
+        :param as_numpy: return (np.ndarray, sample_rate) instead of AudioSegment
+        :param params: other /api/tts query parameters (priority, timeout...)
+        """
+        response = self.session.post(self.url, json={'text': data0}, params={'lang': lang, **params},
+                                     timeout=self.timeout)
+        response = response_handler(response)
+        return decode(response.content, response.headers.get('Content-Type'), as_numpy)
+
+    def stream(self, data0: str, lang: str, frame_size: int = 1024, framer: PCMFramer = None, **params):
+        """Потоковый синтез: кадры float32 по frame_size отсчётов по мере прихода.
+        Частота дискретизации доступна как framer.sample_rate после первого кадра:
+
+            framer = PCMFramer(1024)
+            for frame in client.stream(text, 'ru', framer=framer): ...
+        """
+        framer = framer or PCMFramer(frame_size)
+        with self.session.post(self.url, json={'text': data0}, params={'lang': lang, 'stream': True, **params},
+                               timeout=self.timeout, stream=True) as response:
+            response_handler(response)
+            for chunk in response.iter_content(chunk_size=None):
+                yield from framer.feed(chunk)
+        tail = framer.flush()
+        if tail is not None:
+            yield tail
+
+    def predict_many(self, texts, lang: str, concurrency: int = 4, as_numpy: bool = False, **params):
+        """Параллельная отправка не более concurrency запросов, результаты в порядке texts"""
+        with ThreadPoolExecutor(max_workers=min(concurrency, self.pool_size)) as executor:
+            return list(executor.map(lambda text: self.predict(text, lang, as_numpy, **params), texts))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncTTSClient:
+    """asyncio вариант TTSClient на httpx
+
+    async with AsyncTTSClient('10.0.0.5:9001') as client:
+        audios = await client.predict_many(texts, 'ru', concurrency=8)
+    """
+
+    def __init__(self, server_ip: str = '0.0.0.0:9001', pool_size: int = 10, timeout: float = 600.0):
+        self.url = f'http://{server_ip}/api/tts'
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(timeout),
+                                        limits=httpx.Limits(max_connections=pool_size))
+
+    async def predict(self, data0: str, lang: str, as_numpy: bool = False, **params):
+        response = await self.client.post(self.url, json={'text': data0}, params={'lang': lang, **params})
+        response = response_handler(response)
+        return decode(response.content, response.headers.get('Content-Type'), as_numpy)
+
+    async def stream(self, data0: str, lang: str, frame_size: int = 1024, framer: PCMFramer = None, **params):
+        """async for frame in client.stream(text, 'ru'): ... (см. TTSClient.stream)"""
+        framer = framer or PCMFramer(frame_size)
+        async with self.client.stream('POST', self.url, json={'text': data0},
+                                      params={'lang': lang, 'stream': True, **params}) as response:
+            if response.status_code != 200:
+                await response.aread()
+            response_handler(response)
+            async for chunk in response.aiter_bytes():
+                for frame in framer.feed(chunk):
+                    yield frame
+        tail = framer.flush()
+        if tail is not None:
+            yield tail
+
+    async def predict_many(self, texts, lang: str, concurrency: int = 4, as_numpy: bool = False, **params):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(text):
+            async with semaphore:
+                return await self.predict(text, lang, as_numpy, **params)
+        return await asyncio.gather(*[one(text) for text in texts])
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_default_client = None
+
 # def predict(data0: str, filter: str, lang: str) -> AudioSegment:
 def predict(data0: str, lang: str) -> AudioSegment:
     """API
     :param data0: string for translate into audio
     :param filter: filter
     :param lang: language
-    :return: 
+    :return:
     """
-
-    server_ip = '0.0.0.0:9001'
-    response = requests.post(
-        f'http://{server_ip}/api/tts',
-        json={'text': data0},
-        # params={'filter': filter,
-        params={
-            'lang': lang}
-        )
-    response = response_handler(response)
-    with open("./output/compressed_audio.snappy", "wb") as f:
-        f.write(response.content)
-
-    with open("./output/compressed_audio.snappy", "rb") as f:
-        compressed_data = f.read()
-    audio_bytes = snappy.uncompress(compressed_data)
-    return AudioSegment.from_file(io.BytesIO(audio_bytes), format="wav")
+    global _default_client
+    if _default_client is None:
+        _default_client = TTSClient()
+    return _default_client.predict(data0, lang)
 
 def response_handler(response):
     status_code = response.status_code
@@ -40,5 +230,9 @@ def response_handler(response):
         raise RuntimeError(response.text)
     elif status_code == 400:
         raise RuntimeError(response.text)
+    elif status_code == 429:
+        logger.warning(f"Server busy, retry after {response.headers.get('Retry-After')} s")
+        raise RuntimeError(response.text)
     elif status_code == 200:
-        return response
\ No newline at end of file
+        return response
+    raise RuntimeError(f"{status_code}: {response.text}")
@@ -0,0 +1,181 @@
+import os
+import torch
+
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+XTTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+
+# Голоса (референсные записи для XTTS)
+VOICES = {
+    'default': "./output.wav",
+}
+
+# Реализации бэкендов (backends.Backend): имя -> модуль.класс,
+# модуль импортируется при первом запросе языка с этим бэкендом
+BACKENDS = {
+    'xtts': 'backends.XTTSBackend',
+    'vits': 'backends.VitsBackend',
+    'vits_onnx': 'backends.VitsOnnxBackend',
+    'fake': 'backends.FakeBackend',
+}
+
+# Настройки языков:
+#   backend - имя из BACKENDS или путь модуль.класс: xtts, vits,
+#             vits_onnx (VITS через ONNX Runtime на CPU)
+#             или fake (детерминированная замена модели для бенчмарков)
+#   sep - разделитель предложений
+#   prep - нормализация текста (prep0/prep) перед синтезом
+#   quantize - динамическое int8 квантование модели (только CPU)
+#   max_chars - необязательно, предел длины фрагмента вместо значения бэкенда
+LANGS = {
+    'ru': {'backend': 'xtts', 'sep': '.', 'prep': True, 'quantize': False},
+    'en': {'backend': 'xtts', 'sep': '.', 'prep': True, 'quantize': False},
+    'it': {'backend': 'xtts', 'sep': '.', 'prep': True, 'quantize': False},
+    'fr': {'backend': 'xtts', 'sep': '.', 'prep': True, 'quantize': False},
+    'ja': {'backend': 'xtts', 'sep': '。', 'prep': False, 'quantize': False},
+    'zh-cn': {'backend': 'xtts', 'sep': '。', 'prep': False, 'quantize': False},
+    'kaz': {'backend': 'vits', 'model': 'facebook/mms-tts-kaz', 'sep': '.', 'prep': False, 'quantize': False},
+    'grc': {'backend': 'vits', 'model': 'facebook/mms-tts-grc', 'sep': '.', 'prep': False, 'quantize': False},
+}
+# Языки вне списка синтезируются XTTS как ru/en
+DEFAULT_LANG = {'backend': 'xtts', 'sep': '.', 'prep': True, 'quantize': False}
+
+
+def _env_langs(var):
+    langs = [lang.strip() for lang in os.environ.get(var, '').split(',') if lang.strip()]
+    unknown = [lang for lang in langs if lang not in LANGS]
+    if unknown:
+        raise ValueError(f'{var}: неизвестные языки {", ".join(unknown)}; допустимые: {", ".join(LANGS)}')
+    return langs
+
+
+# Квантование можно включить без правки конфига: TTS_QUANTIZE_LANGS=kaz,grc
+for _lang in _env_langs('TTS_QUANTIZE_LANGS'):
+    LANGS[_lang]['quantize'] = True
+# То же для ONNX: TTS_ONNX_LANGS=kaz,grc
+for _lang in _env_langs('TTS_ONNX_LANGS'):
+    LANGS[_lang]['backend'] = 'vits_onnx'
+
+# Бенчмарк без весов моделей: TTS_FAKE_BACKEND=1 переключает все языки на fake.
+# FAKE_RTF - время синтеза / длительность аудио, FAKE_CHARS_PER_SEC - темп речи
+FAKE_BACKEND = os.environ.get('TTS_FAKE_BACKEND', '0') == '1'
+FAKE_RTF = float(os.environ.get('TTS_FAKE_RTF', 0.3))
+FAKE_CHARS_PER_SEC = 15
+if FAKE_BACKEND:
+    for _cfg in list(LANGS.values()) + [DEFAULT_LANG]:
+        _cfg['backend'] = 'fake'
+
+# Экспортированные ONNX графы и число потоков ONNX Runtime
+ONNX_DIR = os.environ.get('TTS_ONNX_DIR', './onnx')
+ONNX_THREADS = int(os.environ.get('TTS_ONNX_THREADS', os.cpu_count() or 1))
+
+# Веса моделей из memory-mapped файлов, общие для воркеров через page cache
+MMAP_WEIGHTS = os.environ.get('TTS_MMAP_WEIGHTS', '0') == '1'
+WEIGHTS_DIR = os.environ.get('TTS_WEIGHTS_DIR', './weights')
+
+# Инкрементальный вывод XTTS для потоковых ответов (stream=true): аудио
+# отдаётся частями по XTTS_STREAM_CHUNK токенов GPT, соседние части
+# сводятся кроссфейдом на XTTS_STREAM_OVERLAP отсчётов
+XTTS_INCREMENTAL = os.environ.get('TTS_XTTS_INCREMENTAL', '1') == '1'
+XTTS_STREAM_CHUNK = int(os.environ.get('TTS_XTTS_STREAM_CHUNK', 20))
+XTTS_STREAM_OVERLAP = int(os.environ.get('TTS_XTTS_STREAM_OVERLAP', 1024))
+
+# Параллельный синтез предложений длинного объявления (CPU): FANOUT_WORKERS
+# процессов, каждый на своей части ядер с прогретыми моделями FANOUT_LANGS;
+# 0 - предложения синтезируются по очереди в процессе сервера
+FANOUT_WORKERS = int(os.environ.get('TTS_FANOUT_WORKERS', 0))
+FANOUT_LANGS = os.environ.get('TTS_FANOUT_LANGS', 'ru,en').split(',')
+
+# Предсинтез объявлений по расписанию рейсов (prerender.py): файл CSV/JSON,
+# горизонт в часах, период перечитывания и опроса простоя очереди, с
+PRERENDER_SCHEDULE = os.environ.get('TTS_PRERENDER_SCHEDULE')
+PRERENDER_TEMPLATES = os.environ.get('TTS_PRERENDER_TEMPLATES')
+PRERENDER_LANGS = os.environ.get('TTS_PRERENDER_LANGS', 'ru,en').split(',')
+PRERENDER_HORIZON = float(os.environ.get('TTS_PRERENDER_HORIZON', 6))
+PRERENDER_INTERVAL = 60
+PRERENDER_IDLE_POLL = 1.0
+
+# Пакетный вывод XTTS: до XTTS_BATCH_SIZE предложений запроса за один проход
+# GPT и HiFi-GAN (1 - по одному, например TTS_XTTS_BATCH_SIZE=4)
+XTTS_BATCH_SIZE = int(os.environ.get('TTS_XTTS_BATCH_SIZE', 1))
+
+# Бюджет памяти на модели, МБ (0 - без ограничения): при превышении
+# выгружаются давно не использованные. Модели без запросов дольше
+# MODEL_IDLE_TIMEOUT с выгружаются (0 - никогда)
+MODEL_MEMORY_MB = int(os.environ.get('TTS_MODEL_MEMORY_MB', 0))
+MODEL_IDLE_TIMEOUT = float(os.environ.get('TTS_MODEL_IDLE_TIMEOUT', 0))
+
+# Очередь синтеза: классы приоритета (меньше - срочнее), потоки синтеза,
+# максимум несрочных задач в очереди (дальше 429 с Retry-After)
+PRIORITIES = {
+    'urgent': 0,
+    'normal': 1,
+    'bulk': 2,
+    'prerender': 3,
+}
+SCHEDULER_WORKERS = int(os.environ.get('TTS_SCHEDULER_WORKERS', 1))
+QUEUE_DEPTH = int(os.environ.get('TTS_QUEUE_DEPTH', 16))
+# Срок выполнения запроса по умолчанию и период проверки отключения клиента, с
+REQUEST_TIMEOUT = float(os.environ.get('TTS_REQUEST_TIMEOUT', 600))
+DISCONNECT_POLL = 0.5
+# Приоритет по API ключу: TTS_API_KEYS=key1:urgent,key2:bulk
+API_KEYS = dict(item.split(':') for item in filter(None, os.environ.get('TTS_API_KEYS', '').split(',')))
+
+# Профилирование отдельных запросов (заголовок X-Profile), только для админских ключей
+ADMIN_KEYS = set(filter(None, os.environ.get('TTS_ADMIN_KEYS', '').split(',')))
+PROFILE_DIR = os.environ.get('TTS_PROFILE_DIR', './profiles')
+PROFILE_INTERVAL = 0.001
+
+# WebSocket /api/tts/ws: сколько порций текста может ждать отправки аудио,
+# дальше сервер перестаёт читать текст от клиента
+WS_MAX_PENDING = 2
+
+# Кэш синтезированного аудио (базовый темп), МБ
+CACHE_MAX_MB = int(os.environ.get('TTS_CACHE_MAX_MB', 512))
+# Частоты дискретизации, которые можно запросить параметром sample_rate
+OUTPUT_RATES = (8000, 16000, 22050, 24000, 44100, 48000)
+# Допустимый темп речи (параметр speed)
+SPEED_MIN = 0.5
+SPEED_MAX = 2.0
+
+# Прогрев моделей при старте сервера
+WARMUP = os.environ.get('TTS_WARMUP', '1') == '1'
+WARMUP_LANGS = os.environ.get('TTS_WARMUP_LANGS', ','.join(LANGS)).split(',')
+WARMUP_TEXT = {
+    'ru': "Уважаемые пассажиры.",
+    'en': "Dear passengers.",
+    'it': "Gentili passeggeri.",
+    'fr': "Chers passagers.",
+    'ja': "乗客の皆様。",
+    'zh-cn': "尊敬的旅客。",
+    'kaz': "Құрметті жолаушылар.",
+    'grc': "Ὦ ἄνδρες.",
+}
+
+
+def lang_config(lang):
+    return LANGS.get(lang, DEFAULT_LANG)
+
+
+def split_cores(n):
+    """Доступные ядра процесса, разбитые на n непересекающихся частей"""
+    cores = sorted(os.sched_getaffinity(0))
+    return [cores[i * len(cores) // n:(i + 1) * len(cores) // n] or cores for i in range(n)]
+
+
+def pin_process(cores):
+    """Настройка дочернего процесса (воркер сервера, процесс пула fanout) на его ядра:
+    потоки torch и ONNX Runtime по числу ядер, веса моделей общие через mmap
+    """
+    global ONNX_THREADS, MMAP_WEIGHTS
+    os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+    ONNX_THREADS = len(cores)
+    MMAP_WEIGHTS = True
+
+
+def check_lang(lang):
+    """Язык из запроса: для неизвестного не создаются ни бэкенд, ни метки метрик"""
+    if lang not in LANGS:
+        raise ValueError(f'Неизвестный язык {lang}; допустимые: {", ".join(LANGS)}')
@@ -0,0 +1,39 @@
+# Типовые объявления аэропорта для бенчмарков и прогрева
+ANNOUNCEMENTS = {
+    'ru': [
+        "Уважаемые пассажиры рейса 10 16 авиакомпании Аэрофлот - Российские авиалинии в Калининград. Посадка в самолёт начнётся через несколько минут, выход номер 120. При посадке в самолёт пассажиров бизнес-класса, участников программы Аэрофлот Бонус. платинового, золотого, серебряного уровней, а также пассажиров тарифной группы Максимум. просим воспользоваться коридором Sky Priority. Пассажиров с детьми до 7 лет просим обращаться к представителю авиакомпании для приоритетной посадки в самолёт.",
+        "Уважаемые пассажиры, прибывшие рейсом 15 87 Аэрофлот-Российские авиалинии из Чебоксары. Приглашаем Вас к транспортёру номер три для получения багажа. Во избежание обменов багажа, убедительно просим Вас сверять номера багажных бирок на багаже с бирками в Ваших авиабилетах. Благодарим Вас за понимание. Негабаритный багаж и детские коляски Вы можете получить у транспортёра 1.",
+        "Уважаемые пассажиры! Информационное табло и телемониторы, находящиеся в терминале, по техническим причинам временно не работают. Убедительно просим вас внимательно слушать звуковые объявления. По всем интересующим вас вопросам просим обращаться на стойку информации в зале вылета Терминала Е.",
+        "Вниманию прибывших пассажиров! Выдача багажа задерживается в связи с активной грозовой деятельностью в районе аэропорта Шереметьево. Авиакомпания приносит извинения за доставленные неудобства.",
+        "Уважаемые пассажиры! Регистрация на рейсы начинается не менее чем за 2 часа и заканчивается не позднее чем за 40 минут до времени вылета вашего рейса.",
+    ],
+    'en': [
+        "Dear passengers of Aeroflot flight 1016 to Kaliningrad. Boarding will begin in a few minutes at gate 120. Business class passengers and Aeroflot Bonus platinum, gold and silver members are kindly requested to use the Sky Priority lane.",
+        "Attention arriving passengers. Baggage delivery is delayed due to thunderstorm activity in the Sheremetyevo airport area. The airline apologizes for the inconvenience.",
+        "Dear passengers. Check-in opens no later than 2 hours and closes 40 minutes before the departure time of your flight.",
+    ],
+    'it': [
+        "Gentili passeggeri del volo Aeroflot 1016 per Kaliningrad. L'imbarco inizierà tra pochi minuti all'uscita 120.",
+        "Attenzione ai passeggeri in arrivo. La consegna dei bagagli è ritardata a causa di un temporale nella zona dell'aeroporto.",
+    ],
+    'fr': [
+        "Chers passagers du vol Aeroflot 1016 à destination de Kaliningrad. L'embarquement commencera dans quelques minutes à la porte 120.",
+        "Attention aux passagers à l'arrivée. La livraison des bagages est retardée en raison d'un orage dans la zone de l'aéroport.",
+    ],
+    'ja': [
+        "アエロフロート航空1016便カリーニングラード行きをご利用のお客様。まもなく120番ゲートより搭乗を開始いたします。",
+        "到着されたお客様にお知らせいたします。雷雨のため手荷物の受け渡しが遅れております。ご迷惑をおかけして申し訳ございません。",
+    ],
+    'zh-cn': [
+        "乘坐俄罗斯航空公司1016航班前往加里宁格勒的旅客请注意。登机将在几分钟后于120号登机口开始。",
+        "到达旅客请注意。由于机场地区雷暴天气，行李交付将延迟。航空公司对此带来的不便深表歉意。",
+    ],
+    'kaz': [
+        "Құрметті жолаушылар. Калининградқа ұшатын 1016 рейсіне отырғызу бірнеше минуттан кейін 120 шығу есігінде басталады.",
+        "Келген жолаушылардың назарына. Әуежай ауданындағы найзағайға байланысты багажды беру кешіктіріледі.",
+    ],
+    'grc': [
+        "Ὦ ἄνδρες ἐπιβάται. Ἡ ναῦς ὀλίγον ὕστερον ἀναχωρήσει.",
+        "Ἀκούσατε, ὦ ξένοι. Τὰ σκεύη ὕστερον ἀποδοθήσεται.",
+    ],
+}
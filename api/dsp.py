@@ -0,0 +1,126 @@
+import functools
+from math import gcd
+
+import numpy as np
+from scipy.signal import firwin, resample_poly
+
+
+@functools.lru_cache(maxsize=32)
+def resampler(source, target):
+    """Полифазный фильтр для пары частот, проектируется один раз"""
+    g = gcd(source, target)
+    up, down = target // g, source // g
+    max_rate = max(up, down)
+    # те же параметры, что resample_poly использует по умолчанию
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    return up, down, taps
+
+
+def resample(audio, source, target):
+    if source == target:
+        return audio
+    up, down, taps = resampler(source, target)
+    return resample_poly(np.asarray(audio, dtype=np.float32), up, down, window=taps).astype(np.float32)
+
+
+class StreamResampler:
+    """resample для сигнала, приходящего частями (предложения, части XTTS).
+
+    История входа и фаза полифазного фильтра переносятся между частями, поэтому
+    склеенный выход совпадает с resample всего сигнала: на стыках нет щелчков,
+    длина не набирает ошибку округления. Выход отстаёт от входа на половину
+    фильтра; остаток отдаёт flush в конце потока.
+    """
+
+    def __init__(self, source, target):
+        self.passthrough = source == target
+        if self.passthrough:
+            return
+        self.up, self.down, taps = resampler(source, target)
+        # те же сдвиги, что в resample_poly: выходные отсчёты в центре фильтра
+        half_len = (len(taps) - 1) // 2
+        pre_pad = self.down - half_len % self.down
+        h = np.concatenate([np.zeros(pre_pad), taps * self.up])
+        self.k = -(-len(h) // self.up)
+        h = np.concatenate([h, np.zeros(self.k * self.up - len(h))])
+        # phases[p, i] = h[p + i * up]
+        self.phases = h.reshape(self.k, self.up).T
+        self.skip = (half_len + pre_pad) // self.down
+        self._next = self.skip
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._start = 0
+        self._received = 0
+
+    def process(self, audio):
+        """Выходные отсчёты, для которых уже есть весь нужный вход"""
+        x = np.asarray(audio, dtype=np.float32)
+        if self.passthrough:
+            return x
+        self._buf = np.concatenate([self._buf, x])
+        self._received += len(x)
+        return self._emit(max(self._next, -(-self._received * self.up // self.down)))
+
+    def flush(self):
+        """Хвост потока (вход после конца - нули, как в resample)"""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        return self._emit(self.skip + -(-self._received * self.up // self.down))
+
+    def _emit(self, stop):
+        m = np.arange(self._next, stop)
+        last = m * self.down // self.up
+        idx = last[:, None] - np.arange(self.k)[None, :] - self._start
+        # вход до начала и после конца сигнала - нули (последний элемент buf)
+        buf = np.append(self._buf, np.float32(0))
+        idx = np.where((idx >= 0) & (idx < len(self._buf)), idx, len(self._buf))
+        y = np.einsum('mk,mk->m', buf[idx], self.phases[m * self.down % self.up])
+        self._next = stop
+        # для следующих отсчётов нужны k - 1 входов до последнего использованного
+        drop = stop * self.down // self.up - self.k + 1 - self._start
+        if drop > 0:
+            self._buf = self._buf[drop:]
+            self._start += drop
+        return y.astype(np.float32)
+
+
+def time_stretch(audio, speed, n_fft=1024, hop=256):
+    """Изменение темпа без изменения высоты тона (фазовый вокодер).
+
+    Все кадры обрабатываются разом: STFT через матрицу индексов, накопление
+    фазы через cumsum, overlap-add через bincount.
+    :param audio: сигнал float
+    :param speed: > 1 быстрее, < 1 медленнее
+    :return: np.ndarray float32 длиной len(audio) / speed
+    """
+    x = np.asarray(audio, dtype=np.float32)
+    if abs(speed - 1) < 1e-3 or len(x) < n_fft:
+        return x
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+    pad = n_fft // 2
+    xp = np.pad(x, pad)
+    n_frames = 1 + (len(xp) - n_fft) // hop
+    idx = np.arange(n_fft)[None, :] + hop * np.arange(n_frames)[:, None]
+    spec = np.fft.rfft(xp[idx] * window, axis=1)
+
+    # дробные позиции исходных кадров для выходных кадров
+    steps = np.arange(0, n_frames - 1, speed)
+    i0 = steps.astype(np.int64)
+    frac = (steps - i0)[:, None]
+    mag = (1 - frac) * np.abs(spec[i0]) + frac * np.abs(spec[i0 + 1])
+
+    omega = 2 * np.pi * hop * np.arange(spec.shape[1]) / n_fft
+    dphi = np.angle(spec[i0 + 1]) - np.angle(spec[i0]) - omega
+    dphi -= 2 * np.pi * np.round(dphi / (2 * np.pi))
+    advance = np.cumsum(omega + dphi, axis=0)
+    phase = np.angle(spec[0]) + np.vstack([np.zeros((1, spec.shape[1])), advance[:-1]])
+
+    frames = np.fft.irfft(mag * np.exp(1j * phase), n=n_fft, axis=1) * window
+    out_idx = (np.arange(n_fft)[None, :] + hop * np.arange(len(steps))[:, None]).ravel()
+    out = np.bincount(out_idx, weights=frames.ravel())
+    norm = np.bincount(out_idx, weights=np.tile(window ** 2, len(steps)))
+    # на краях окна почти не перекрываются: деление на малую норму раздуло бы хвост
+    out = out / np.maximum(norm, 0.1 * norm.max())
+    n = int(round(len(x) / speed))
+    # последний кадр может не дотянуть до конца на долю hop
+    out = np.pad(out, (0, max(0, pad + n - len(out))))
+    return out[pad:pad + n].astype(np.float32)
@@ -0,0 +1,21 @@
+import hashlib
+import time
+
+import numpy as np
+
+import config
+
+
+def synth(text, sample_rate, speed=1.0):
+    """Детерминированная замена модели для бенчмарков без весов.
+
+    Длительность аудио пропорциональна длине текста, время "синтеза" -
+    длительность * config.FAKE_RTF. Одинаковый текст даёт одинаковый сигнал.
+    """
+    duration = max(0.2, len(text) / config.FAKE_CHARS_PER_SEC / speed)
+    time.sleep(duration * config.FAKE_RTF)
+    seed = int.from_bytes(hashlib.md5(text.encode('utf-8')).digest()[:4], 'little')
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    wav = 0.3 * np.sin(2 * np.pi * (100 + seed % 150) * t) + 0.01 * rng.standard_normal(len(t))
+    return wav.astype(np.float32).tolist()
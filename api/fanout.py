@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from loguru import logger
+
+import config
+
+# Пул процессов для параллельного синтеза предложений одного объявления.
+# Каждый процесс работает на своей части ядер и держит прогретые модели
+_pool = None
+_lock = threading.Lock()
+
+
+def _init(cores, langs):
+    try:
+        mine = cores.get_nowait()
+    except queue.Empty:
+        mine = sorted(os.sched_getaffinity(0))
+    # та же настройка, что у воркеров сервера: веса общие через page cache
+    config.pin_process(mine)
+    import backends
+    for lang in langs:
+        try:
+            backends.get(lang).load(quantized=config.lang_config(lang)['quantize'])
+        except Exception:
+            logger.exception(f'Не удалось загрузить модель {lang} в процессе пула')
+    logger.info(f'Процесс пула {os.getpid()}: ядра {mine}')
+
+
+def _ping():
+    return os.getpid()
+
+
+def _synth(lang, sentence, voice, quantized, speed):
+    import backends
+    import pipeline
+    wav = pipeline.synthesize_sentence(backends.get(lang), sentence, voice, quantized, speed)
+    return np.asarray(wav, dtype=np.float32)
+
+
+def pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            ctx = multiprocessing.get_context('spawn')
+            slices = ctx.Queue()
+            for cores in config.split_cores(config.FANOUT_WORKERS):
+                slices.put(cores)
+            _pool = ProcessPoolExecutor(config.FANOUT_WORKERS, mp_context=ctx, initializer=_init,
+                                        initargs=(slices, config.FANOUT_LANGS))
+        return _pool
+
+
+def start():
+    """Запуск процессов пула и загрузка моделей заранее, а не на первом запросе"""
+    futures = [pool().submit(_ping) for _ in range(config.FANOUT_WORKERS)]
+    wait(futures)
+    logger.info(f'Пул синтеза: {len({f.result() for f in futures})} процессов')
+
+
+def ordered(lang, sentences, voice='default', quantized=False, speed=1.0):
+    """Генератор: предложения синтезируются параллельно, аудио выдаётся по порядку.
+
+    Очередь пула FIFO и не знает приоритетов, поэтому задача держит в пуле не
+    больше FANOUT_WORKERS предложений и добавляет следующее только в своём шаге
+    планировщика. Срочная задача ждёт не весь хвост длинной, а одно предложение.
+    """
+    global _pool
+    todo = iter(sentences)
+    futures = deque()
+
+    def top_up():
+        for sentence in todo:
+            futures.append(pool().submit(_synth, lang, sentence, voice, quantized, speed))
+            if len(futures) >= config.FANOUT_WORKERS:
+                return
+
+    try:
+        top_up()
+        while futures:
+            wav = futures.popleft().result()
+            top_up()
+            yield wav.tolist()
+    except BrokenProcessPool:
+        # упавший процесс ломает весь пул, следующий запрос создаст новый
+        with _lock:
+            _pool = None
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
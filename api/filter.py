@@ -2,9 +2,24 @@ from pydub import AudioSegment
 from scipy.signal import butter, lfilter, filtfilt, iirfilter
 import numpy as np
 
+def to_pcm16(audio):
+    # то же преобразование, что в compres, но сразу в байты для потоковой отдачи
+    audio_n = np.asarray(audio, dtype=np.float32)
+    return (np.clip(audio_n, -1, 1) * 32767).astype(np.int16).tobytes()
+
+def wav_header(sample_rate, data_size=0xFFFFFFFF):
+    # заголовок WAV для потока неизвестной длины: размеры 0xFFFFFFFF
+    riff_size = 0xFFFFFFFF if data_size == 0xFFFFFFFF else data_size + 36
+    return (b'RIFF' + riff_size.to_bytes(4, 'little') + b'WAVE'
+            + b'fmt ' + (16).to_bytes(4, 'little') + (1).to_bytes(2, 'little') + (1).to_bytes(2, 'little')
+            + sample_rate.to_bytes(4, 'little') + (sample_rate * 2).to_bytes(4, 'little')
+            + (2).to_bytes(2, 'little') + (16).to_bytes(2, 'little')
+            + b'data' + data_size.to_bytes(4, 'little'))
+
 def compres(audio, sample_rate):
     audio_n = np.array(audio)
-    audio_n = (audio_n * 32767).astype(np.int16)
+    # после time_stretch и resample бывают выбросы выше 1.0: без клипа они меняют знак в int16
+    audio_n = (np.clip(audio_n, -1, 1) * 32767).astype(np.int16)
     audio_segment = AudioSegment( audio_n.tobytes(), frame_rate=sample_rate, sample_width=audio_n.dtype.itemsize, channels=1 )
     return audio_segment
 
@@ -0,0 +1,89 @@
+import os
+from contextlib import contextmanager
+
+import torch
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+import config
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Этапы: prep0, prep, inference, filter, encode (загрузка моделей - tts_model_load_seconds)
+STAGE_SECONDS = Histogram(
+    'tts_stage_seconds', 'Время этапа обработки запроса',
+    ['stage', 'lang', 'backend'], buckets=BUCKETS,
+)
+MODEL_LOAD_SECONDS = Histogram(
+    'tts_model_load_seconds', 'Время загрузки модели',
+    ['model'], buckets=BUCKETS,
+)
+REAL_TIME_FACTOR = Histogram(
+    'tts_real_time_factor', 'Время синтеза / длительность аудио',
+    ['lang', 'backend'], buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10),
+)
+TIME_TO_FIRST_AUDIO = Histogram(
+    'tts_time_to_first_audio_seconds', 'Время от начала синтеза до первой части аудио',
+    ['lang', 'backend'], buckets=BUCKETS,
+)
+MODEL_RESIDENT_BYTES = Gauge(
+    'tts_model_resident_bytes', 'Измеренный размер загруженной модели',
+    ['model'], multiprocess_mode='livesum',
+)
+MODEL_EVICTIONS = Counter(
+    'tts_model_evictions_total', 'Выгрузки моделей',
+    ['model', 'reason'],
+)
+COALESCED_REQUESTS = Counter(
+    'tts_coalesced_requests_total', 'Запросы, присоединённые к идущему синтезу (сэкономленные синтезы)',
+)
+STREAM_ABORTED = Counter(
+    'tts_stream_aborted_total', 'Потоковые ответы, оборванные до конца аудио',
+    ['reason'],
+)
+PRERENDER = Counter(
+    'tts_prerender_total', 'Предсинтез: rendered - синтезировано, hit - отдано живому запросу',
+    ['result'],
+)
+CACHE_REQUESTS = Counter(
+    'tts_cache_requests_total', 'Обращения к кэшам',
+    ['cache', 'result'],
+)
+IN_FLIGHT = Gauge(
+    'tts_in_flight_requests', 'Запросы в обработке',
+    multiprocess_mode='livesum',
+)
+QUEUE_DEPTH = Gauge(
+    'tts_queue_depth', 'Задачи в очереди синтеза',
+    multiprocess_mode='livesum',
+)
+
+
+def backend(lang):
+    return config.lang_config(lang)['backend']
+
+
+@contextmanager
+def stage(name, lang):
+    """with stage('prep', lang): ...
+    Заодно отмечает этап в профиле torch.profiler (см. profiling.py)
+    """
+    with torch.profiler.record_function(name), STAGE_SECONDS.labels(name, lang, backend(lang)).time():
+        yield
+
+
+def cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def render():
+    # при нескольких воркерах метрики собираются из PROMETHEUS_MULTIPROC_DIR
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -0,0 +1,247 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+from loguru import logger
+
+# TTS, transformers и onnxruntime импортируются в загрузчиках:
+# процесс не тянет библиотеки языков, которые не запрашивались
+import weights
+import metrics
+import config
+
+# Загруженные модели: ключ -> _Entry, в порядке последнего использования.
+# При превышении config.MODEL_MEMORY_MB и после config.MODEL_IDLE_TIMEOUT
+# простоя модели выгружаются и загружаются снова при следующем запросе
+_models = OrderedDict()
+_evicted = set()
+_loading = {}
+_lock = threading.RLock()
+_janitor = None
+
+
+class _Entry:
+    __slots__ = ('model', 'nbytes', 'last_used')
+
+    def __init__(self, model, nbytes):
+        self.model = model
+        self.nbytes = nbytes
+        self.last_used = time.monotonic()
+
+
+def _conv1d_to_linear(module):
+    from transformers.pytorch_utils import Conv1D
+    # GPT2 внутри XTTS использует transformers Conv1D, который quantize_dynamic не видит
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            linear = torch.nn.Linear(child.weight.shape[0], child.weight.shape[1])
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+    return module
+
+
+def quantize(model):
+    """Динамическое int8 квантование Linear и LSTM слоёв"""
+    if config.DEVICE != 'cpu':
+        logger.warning('Квантование поддерживается только на CPU, модель оставлена в fp32')
+        return model
+    return torch.quantization.quantize_dynamic(
+        _conv1d_to_linear(model), {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8, inplace=True
+    )
+
+
+def _rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _tensor_bytes(obj):
+    if isinstance(obj, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in obj)
+    if not isinstance(obj, torch.nn.Module):
+        return 0
+    tensors = {t.data_ptr(): t for t in list(obj.parameters()) + list(obj.buffers())}
+    return sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+def _footprint(model, rss_before):
+    # веса torch моделей считаем точно; квантованные и ONNX веса видны только по RSS
+    return max(_tensor_bytes(model), _rss() - rss_before)
+
+
+def _evict(key, reason):
+    entry = _models.pop(key)
+    _evicted.add(key)
+    metrics.MODEL_RESIDENT_BYTES.labels(key).set(0)
+    metrics.MODEL_EVICTIONS.labels(key, reason).inc()
+    logger.info(f'Выгрузка модели {key} ({reason}), {entry.nbytes / 2 ** 20:.0f} МБ')
+
+
+def _fit(keep):
+    budget = config.MODEL_MEMORY_MB * 2 ** 20
+    if not budget:
+        return
+    while sum(e.nbytes for e in _models.values()) > budget:
+        victim = next((k for k in _models if k != keep), None)
+        if victim is None:
+            logger.warning(f'Модель {keep} больше бюджета памяти {config.MODEL_MEMORY_MB} МБ')
+            return
+        _evict(victim, 'budget')
+
+
+def _collect():
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _janitor_loop():
+    while True:
+        time.sleep(max(1.0, min(config.MODEL_IDLE_TIMEOUT / 2, 60)))
+        now = time.monotonic()
+        with _lock:
+            idle = [k for k, e in _models.items() if now - e.last_used > config.MODEL_IDLE_TIMEOUT]
+            for key in idle:
+                _evict(key, 'idle')
+        if idle:
+            _collect()
+
+
+def _start_janitor():
+    global _janitor
+    if config.MODEL_IDLE_TIMEOUT and _janitor is None:
+        _janitor = threading.Thread(target=_janitor_loop, daemon=True, name='model-janitor')
+        _janitor.start()
+
+
+def _get(key, loader):
+    with _lock:
+        entry = _models.get(key)
+        metrics.cache('model', entry is not None)
+        if entry is not None:
+            _models.move_to_end(key)
+            entry.last_used = time.monotonic()
+            return entry.model
+        _start_janitor()
+        key_lock = _loading.setdefault(key, threading.Lock())
+    # загрузка под замком модели: другие модели в это время доступны
+    with key_lock:
+        with _lock:
+            if key in _models:
+                return _models[key].model
+        logger.info(f'Загрузка модели {key}' + (' (после выгрузки)' if key in _evicted else ''))
+        rss_before = _rss()
+        t0 = time.perf_counter()
+        model = loader()
+        metrics.MODEL_LOAD_SECONDS.labels(key).observe(time.perf_counter() - t0)
+        entry = _Entry(model, _footprint(model, rss_before))
+        metrics.MODEL_RESIDENT_BYTES.labels(key).set(entry.nbytes)
+        with _lock:
+            _models[key] = entry
+            _evicted.discard(key)
+            _fit(keep=key)
+    _collect()
+    return model
+
+
+def _mmap_enabled():
+    # на GPU веса всё равно копируются в видеопамять
+    return config.MMAP_WEIGHTS and config.DEVICE == 'cpu'
+
+
+def _xtts_mmap():
+    """XTTS без собственной копии весов: модель строится на meta device,
+    веса присваиваются из mmap файла (его создаёт первый процесс)"""
+    from TTS.api import TTS
+    from TTS.utils.manage import ModelManager
+    from TTS.utils.synthesizer import Synthesizer
+    from TTS.tts.configs.xtts_config import XttsConfig
+    from TTS.tts.models.xtts import Xtts
+    from TTS.tts.layers.xtts.tokenizer import VoiceBpeTokenizer
+
+    weights.ensure(config.XTTS_MODEL, lambda: TTS(config.XTTS_MODEL).synthesizer.tts_model)
+    manager = ModelManager(models_file=TTS.get_models_file_path(), progress_bar=False)
+    model_dir, config_path, _ = manager.download_model(config.XTTS_MODEL)
+    cfg = XttsConfig()
+    cfg.load_json(config_path)
+    with torch.device('meta'):
+        model = Xtts.init_from_config(cfg)
+        # как в Xtts.load_checkpoint(eval=True): модули инференса ссылаются на веса gpt
+        model.gpt.init_gpt_for_inference(kv_cache=model.args.kv_cache, use_deepspeed=False)
+    model.tokenizer = VoiceBpeTokenizer(vocab_file=os.path.join(model_dir, 'vocab.json'))
+    weights.load_into(model, config.XTTS_MODEL)
+    model.eval()
+    # обёртка TTS без загрузки модели, синтезатор получает готовую
+    tts = TTS()
+    tts.model_name = config.XTTS_MODEL
+    tts.synthesizer = Synthesizer(use_cuda=False)
+    tts.synthesizer.tts_model = model
+    tts.synthesizer.tts_config = cfg
+    tts.synthesizer.output_sample_rate = cfg.audio['output_sample_rate']
+    return tts
+
+
+def get_xtts(quantized=False):
+    def loader():
+        if _mmap_enabled():
+            tts = _xtts_mmap()
+        else:
+            from TTS.api import TTS
+            tts = TTS(config.XTTS_MODEL).to(config.DEVICE)
+        if quantized:
+            xtts = tts.synthesizer.tts_model
+            xtts.gpt = quantize(xtts.gpt)
+        return tts
+    return _get('xtts-int8' if quantized else 'xtts', loader)
+
+
+def get_vits(model_name, quantized=False):
+    def loader():
+        from transformers import VitsConfig, VitsModel, VitsTokenizer
+        if _mmap_enabled():
+            weights.ensure(model_name, lambda: VitsModel.from_pretrained(model_name))
+            with torch.device('meta'):
+                model = VitsModel(VitsConfig.from_pretrained(model_name))
+            weights.load_into(model, model_name)
+        else:
+            model = VitsModel.from_pretrained(model_name).to(config.DEVICE)
+        model.eval()
+        if quantized:
+            model = quantize(model)
+        return model, VitsTokenizer.from_pretrained(model_name)
+    return _get(f'{model_name}-int8' if quantized else model_name, loader)
+
+
+def get_vits_onnx(model_name):
+    def loader():
+        from transformers import VitsTokenizer
+        import onnx_backend
+        return onnx_backend.load(model_name), VitsTokenizer.from_pretrained(model_name)
+    return _get(f'{model_name}-onnx', loader)
+
+
+def loaded():
+    with _lock:
+        return list(_models)
+
+
+def resident():
+    """Загруженные модели: размер и время простоя, плюс выгруженные"""
+    now = time.monotonic()
+    with _lock:
+        return {
+            'budget_mb': config.MODEL_MEMORY_MB or None,
+            'used_mb': round(sum(e.nbytes for e in _models.values()) / 2 ** 20, 1),
+            'models': [{'name': k, 'mb': round(e.nbytes / 2 ** 20, 1), 'idle_s': round(now - e.last_used, 1)}
+                       for k, e in _models.items()],
+            'evicted': sorted(_evicted),
+        }
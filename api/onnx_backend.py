@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import torch
+import onnxruntime as ort
+from loguru import logger
+
+from transformers import VitsModel
+
+import config
+
+
+class _Waveform(torch.nn.Module):
+    # torch.onnx.export не умеет в ModelOutput, оставляем только waveform
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids):
+        return self.model(input_ids).waveform
+
+
+def onnx_path(model_name):
+    return os.path.join(config.ONNX_DIR, model_name.replace('/', '_') + '.onnx')
+
+
+def export(model_name, path):
+    """Экспорт VitsModel в ONNX с динамической длиной входа"""
+    logger.info(f'Экспорт {model_name} в {path}')
+    model = VitsModel.from_pretrained(model_name)
+    model.eval()
+    dummy = torch.ones((1, 32), dtype=torch.long)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with torch.no_grad():
+        torch.onnx.export(
+            _Waveform(model),
+            (dummy,),
+            tmp_path,
+            input_names=['input_ids'],
+            output_names=['waveform'],
+            dynamic_axes={'input_ids': {1: 'sequence'}, 'waveform': {1: 'samples'}},
+            opset_version=17,
+        )
+    # rename атомарен: другой процесс не увидит недописанный файл
+    os.replace(tmp_path, path)
+
+
+def load(model_name):
+    path = onnx_path(model_name)
+    if not os.path.exists(path):
+        export(model_name, path)
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = config.ONNX_THREADS
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+
+def infer(session, input_ids):
+    """input_ids - тензор из VitsTokenizer, результат - waveform как у VitsModel"""
+    waveform, = session.run(['waveform'], {'input_ids': input_ids.numpy().astype(np.int64)})
+    return waveform
@@ -0,0 +1,146 @@
+import re
+import time
+
+from preprocessing import prep0, prep
+import backends
+import fanout
+import metrics
+import config
+
+
+def split_sentences(data, sep):
+    s_new = data.split(sep)
+    if s_new[-1] == '':
+        s_new.pop()
+    return s_new
+
+
+def sentences(data, lang, file_path=''):
+    """Разбиение на предложения и нормализация текста"""
+    cfg = config.lang_config(lang)
+    if not cfg['prep']:
+        return split_sentences(data, cfg['sep'])
+    if lang == "en" and file_path != '':
+        # ssml синтез (main_tts_ssml) отключён
+        return []
+    with metrics.stage('prep0', lang):
+        data = prep0(data)
+    with metrics.stage('prep', lang):
+        return [prep(s, lang) for s in split_sentences(data, '.')]
+
+
+def take_complete(buffer, lang):
+    """Отделяет законченные предложения от начала буфера при вводе текста частями
+    :return: (законченные предложения, остаток)
+    """
+    sep = config.lang_config(lang)['sep']
+    # точка в конце фрагмента может оказаться частью числа, ждём пробела после неё
+    pattern = re.escape(sep) + (r'\s' if sep == '.' else '')
+    ends = [m.end() for m in re.finditer(pattern, buffer)]
+    if not ends:
+        return '', buffer
+    return buffer[:ends[-1]], buffer[ends[-1]:]
+
+
+def sample_rate(lang):
+    return backends.get(lang).sample_rate
+
+
+def split_long(s, max_chars):
+    """Дробление предложения длиннее max_chars по знакам препинания, затем по словам"""
+    if len(s) <= max_chars:
+        return [s]
+    pieces = []
+    for clause in re.findall(r'[^,;:]+[,;:]?', s):
+        pieces += [clause] if len(clause) <= max_chars else clause.split()
+    parts = []
+    current = ''
+    for piece in filter(None, (p.strip() for p in pieces)):
+        if current and len(current) + 1 + len(piece) > max_chars:
+            parts.append(current)
+            current = piece
+        else:
+            current = f'{current} {piece}' if current else piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def synthesize_sentence(backend, sentence, voice='default', quantized=False, speed=1.0):
+    """Аудио одного предложения; длинное дробится по max_chars бэкенда"""
+    wav = []
+    for part in backend.synthesize_batch(split_long(sentence, backend.max_chars), voice, quantized, speed):
+        wav += list(part)
+    return wav
+
+
+def _chunks(backend, sentence, voice, quantized, speed, incremental):
+    if incremental:
+        for part in split_long(sentence, backend.max_chars):
+            yield from backend.synthesize_stream(part, voice, quantized, speed)
+        return
+    yield synthesize_sentence(backend, sentence, voice, quantized, speed)
+
+
+def _batched(backend, group, voice, quantized, speed):
+    # фрагменты нескольких предложений - один вызов synthesize_batch
+    parts = [split_long(sentence, backend.max_chars) for sentence in group]
+    wavs = iter(backend.synthesize_batch([p for ps in parts for p in ps], voice, quantized, speed))
+    for ps in parts:
+        wav = []
+        for _ in ps:
+            wav += list(next(wavs))
+        yield wav
+
+
+def stream(data, lang, file_path='', voice='default', quantized=None, speed=1.0, incremental=False):
+    """Генератор: аудио по одному предложению
+    :param speed: темп речи средствами модели (> 1 быстрее)
+    :param incremental: отдавать части предложения по мере готовности (synthesize_stream)
+    """
+    backend = backends.get(lang)
+    if quantized is None:
+        quantized = backend.cfg['quantize']
+    start = time.perf_counter()
+    busy = 0.0
+    samples = 0
+    items = sentences(data, lang, file_path)
+    if config.FANOUT_WORKERS and not incremental:
+        # синтез в пуле процессов (и для коротких запросов: ядра отданы пулу),
+        # шаг - ожидание очередного предложения по порядку
+        groups = [fanout.ordered(lang, items, voice, quantized, speed)]
+    elif incremental or backend.batch_size <= 1:
+        groups = (_chunks(backend, sentence, voice, quantized, speed, incremental) for sentence in items)
+    else:
+        # первое аудио - после всей группы, зато модель считает её одним проходом
+        size = backend.batch_size
+        groups = (_batched(backend, items[i:i + size], voice, quantized, speed) for i in range(0, len(items), size))
+    for chunks in groups:
+        while True:
+            t0 = time.perf_counter()
+            with metrics.stage('inference', lang):
+                wav = next(chunks, None)
+            if wav is None:
+                break
+            busy += time.perf_counter() - t0
+            if not samples:
+                metrics.TIME_TO_FIRST_AUDIO.labels(lang, metrics.backend(lang)).observe(time.perf_counter() - start)
+            samples += len(wav)
+            yield wav
+    if samples:
+        metrics.REAL_TIME_FACTOR.labels(lang, metrics.backend(lang)).observe(busy / (samples / sample_rate(lang)))
+
+
+def synthesize(data, lang, file_path='', voice='default', quantized=None):
+    """Синтез текста целиком
+    :param data: текст
+    :param lang: язык
+    :param file_path: путь к ssml файлу
+    :param voice: голос из config.VOICES
+    :param quantized: int8 модель; None - по настройке языка
+    :return: (audio, sample_rate)
+    """
+    audio = []
+    for wav in stream(data, lang, file_path, voice, quantized):
+        audio += wav
+    return audio, sample_rate(lang)
@@ -1,10 +1,8 @@
-from TTS.api import TTS
 # from TTS.bin.synthesize_new import main_tts
 # from TTS.bin.ssml_synthesize import main_tts_ssml
 # from synthesize_new import main_tts
 # from ssml_synthesize import main_tts_ssml
 from IPython.display import Audio
-import torch
 
 def prep0(s):
     new = s.replace('<','.')
@@ -137,27 +135,3 @@ def prep(s, lang):
             if i == len(new)-1:
                 new[i] = new[i].replace('.','')
     return ' '.join(new)
-  
-def made_audio(s, lang, file_path = ''):
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-    s_new = prep0(s)
-    s_new = s_new.split(".")
-    ans = []
-    wav = []
-    if s_new[-1] == '':
-        s_new.pop()
-    if lang == "en" and file_path != '':
-        # wav = main_tts_ssml(file_path)
-        ans = wav.copy()
-    else:
-        for i in range(len(s_new)):
-            s_prep = prep(s_new[i], lang)
-            if lang == "en":
-                # wav = main_tts(s_prep, "tts_models/multilingual/multi-dataset/xtts_v2", "server.wav", "/home/ubuntu/projects/kp.zuev/voicegen/TTSC/recipes/ljspeech/audio_shar/A7-EN.mp3", lang)
-                wav = tts.tts(text=s_prep, speaker_wav="./output.wav", language=lang)
-            else:
-                # wav = main_tts(s_prep, "tts_models/multilingual/multi-dataset/xtts_v2", "server.wav", "/home/ubuntu/projects/kp.zuev/voicegen/TTSC/recipes/ljspeech/audio_shar/A7-RU.mp3", lang)
-                wav = tts.tts(text=s_prep, speaker_wav="./output.wav", language=lang)
-            ans += wav
-    return ans
\ No newline at end of file
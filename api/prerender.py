@@ -0,0 +1,178 @@
+"""Предварительный синтез объявлений по расписанию рейсов.
+
+Расписание - локальный CSV (с заголовком) или JSON (список объектов) с полями
+flight, airline, destination, origin, departure или arrival (ISO время),
+gate, belt, delay_until и необязательным langs (через запятую). Для рейсов, вылетающих в
+ближайшие config.PRERENDER_HORIZON часов, по шаблонам собираются ожидаемые
+объявления (посадка, задержка, багаж) и синтезируются тем же pipeline.stream
+с приоритетом prerender, только когда очередь пуста. Результат кладётся в
+cache.responses под тем же ключом, что у живого запроса с этим текстом.
+"""
+import concurrent.futures
+import csv
+import datetime
+import json
+import os
+import threading
+import time
+
+from loguru import logger
+
+from pipeline import stream, sample_rate
+from scheduler import scheduler, QueueFull
+from singleflight import inflight
+import cache
+import metrics
+import config
+
+# Шаблоны по типу объявления и языку; поля - колонки расписания.
+# Можно заменить файлом config.PRERENDER_TEMPLATES той же структуры
+TEMPLATES = {
+    'boarding': {
+        'ru': "Уважаемые пассажиры рейса {flight} авиакомпании {airline} в {destination}. Посадка в самолёт начнётся через несколько минут, выход номер {gate}.",
+        'en': "Dear passengers of {airline} flight {flight} to {destination}. Boarding will begin in a few minutes at gate {gate}.",
+    },
+    'delay': {
+        'ru': "Уважаемые пассажиры! Вылет рейса {flight} авиакомпании {airline} в {destination} задерживается до {delay_until}. Авиакомпания приносит извинения за доставленные неудобства.",
+        'en': "Dear passengers. {airline} flight {flight} to {destination} is delayed until {delay_until}. The airline apologizes for the inconvenience.",
+    },
+    'baggage': {
+        'ru': "Уважаемые пассажиры, прибывшие рейсом {flight} {airline} из {origin}. Приглашаем Вас к транспортёру номер {belt} для получения багажа.",
+        'en': "Dear passengers arriving on {airline} flight {flight} from {origin}. Please proceed to baggage belt {belt}.",
+    },
+}
+
+# ключ кэша -> число живых запросов, получивших предсинтезированное аудио
+_rendered = {}
+_stats = {'requests': 0, 'hits': 0, 'errors': 0}
+_lock = threading.Lock()
+_schedule = {'mtime': None, 'rows': []}
+
+
+def read_schedule(path):
+    mtime = os.path.getmtime(path)
+    if _schedule['mtime'] != mtime:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.json'):
+                rows = json.load(f)
+            else:
+                rows = list(csv.DictReader(f))
+        _schedule.update(mtime=mtime, rows=rows)
+        logger.info(f'Расписание {path}: {len(rows)} рейсов')
+    return _schedule['rows']
+
+
+def templates():
+    if config.PRERENDER_TEMPLATES:
+        with open(config.PRERENDER_TEMPLATES, encoding='utf-8') as f:
+            return json.load(f)
+    return TEMPLATES
+
+
+def announcements(rows, now=None):
+    """(текст, язык) для рейсов в горизонте, ближайшие первыми"""
+    now = now or datetime.datetime.now()
+    horizon = now + datetime.timedelta(hours=config.PRERENDER_HORIZON)
+    upcoming = []
+    for row in rows:
+        row = {k: str(v).strip() for k, v in row.items() if v not in (None, '')}
+        try:
+            when = datetime.datetime.fromisoformat(row.get('departure') or row['arrival'])
+        except (KeyError, ValueError):
+            continue
+        if when.tzinfo is not None:
+            # время со смещением (2026-10-19T12:00:00+03:00) - в локальное без зоны, как now
+            when = when.astimezone().replace(tzinfo=None)
+        if now <= when <= horizon:
+            upcoming.append((when, row))
+    result = []
+    for _, row in sorted(upcoming, key=lambda item: item[0]):
+        langs = row.get('langs', ','.join(config.PRERENDER_LANGS)).split(',')
+        for kind, by_lang in templates().items():
+            for lang in langs:
+                template = by_lang.get(lang)
+                try:
+                    result.append((template.format(**row), lang))
+                except (AttributeError, KeyError):
+                    # нет шаблона для языка или в строке нет нужного поля
+                    continue
+    return result
+
+
+def render(text, lang):
+    key = cache.key(text, lang)
+    if key in cache.responses:
+        return False
+    prio = config.PRIORITIES['prerender']
+    deadline = time.monotonic() + config.REQUEST_TIMEOUT
+
+    def submit(on_chunk):
+        return scheduler.submit(stream(text, lang), prio, deadline, on_chunk=on_chunk)
+    # тот же ключ, что у живого запроса в обычном темпе: пришедший во время
+    # предсинтеза запрос ждёт эту задачу, а не ставит вторую
+    flight, shared = inflight.join(cache.key(text, lang, speed=1.0), submit,
+                                   on_join=lambda f: scheduler.promote(f.future, prio, deadline))
+    try:
+        flight.future.result(timeout=max(0, deadline - time.monotonic()))
+    except concurrent.futures.TimeoutError:
+        flight.leave()
+        raise
+    if shared:
+        # кэш заполняет запрос, который поставил задачу
+        return False
+    cache.responses.put(key, flight.audio(), sample_rate(lang))
+    with _lock:
+        _rendered.setdefault(key, 0)
+    metrics.PRERENDER.labels('rendered').inc()
+    return True
+
+
+def observe(key, hit):
+    """Живой запрос к кэшу; вызывается из /api/tts"""
+    with _lock:
+        _stats['requests'] += 1
+        if hit and key in _rendered:
+            _rendered[key] += 1
+            _stats['hits'] += 1
+            metrics.PRERENDER.labels('hit').inc()
+
+
+def report():
+    with _lock:
+        used = sum(1 for n in _rendered.values() if n)
+        return {
+            'schedule': config.PRERENDER_SCHEDULE,
+            'rendered': len(_rendered),
+            'used': used,
+            'use_rate': used / len(_rendered) if _rendered else None,
+            'requests': _stats['requests'],
+            'hits': _stats['hits'],
+            'hit_rate': _stats['hits'] / _stats['requests'] if _stats['requests'] else None,
+            'errors': _stats['errors'],
+        }
+
+
+def _wait_idle():
+    while scheduler.pending() > 0:
+        time.sleep(config.PRERENDER_IDLE_POLL)
+
+
+def run():
+    """Фоновый цикл: перечитать расписание, досинтезировать недостающее"""
+    while True:
+        try:
+            items = announcements(read_schedule(config.PRERENDER_SCHEDULE))
+        except Exception:
+            logger.exception('Не удалось прочитать расписание')
+            items = []
+        for text, lang in items:
+            _wait_idle()
+            try:
+                render(text, lang)
+            except QueueFull:
+                continue
+            except Exception:
+                logger.exception(f'Ошибка предсинтеза [{lang}] {text[:40]}')
+                with _lock:
+                    _stats['errors'] += 1
+        time.sleep(config.PRERENDER_INTERVAL)
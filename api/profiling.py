@@ -0,0 +1,58 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+import torch
+from loguru import logger
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+import config
+
+
+def allowed(api_key):
+    return api_key is not None and api_key in config.ADMIN_KEYS
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def trace_path(trace_id, kind):
+    ext = {'chrome': 'trace.json', 'speedscope': 'speedscope.json'}[kind]
+    return os.path.join(config.PROFILE_DIR, f'{trace_id}.{ext}')
+
+
+@contextmanager
+def trace(trace_id):
+    """torch.profiler и семплирующий профилировщик Python на время блока.
+
+    Этапы конвейера отмечены record_function (см. metrics.stage) и видны
+    в chrome trace как отдельные интервалы.
+    """
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    sampler = Profiler(interval=config.PROFILE_INTERVAL)
+    with torch.profiler.profile(activities=activities, record_shapes=False, with_stack=False) as prof:
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+    prof.export_chrome_trace(trace_path(trace_id, 'chrome'))
+    with open(trace_path(trace_id, 'speedscope'), 'w', encoding='utf-8') as f:
+        f.write(sampler.output(SpeedscopeRenderer()))
+    logger.info(f'Профиль запроса сохранён: {trace_id}')
+
+
+def traced(trace_id, steps):
+    """Шаги задачи планировщика, выполненные разом под профилировщиком.
+
+    Вся задача - один шаг воркера, поэтому шаги чужих задач в профиль не попадают,
+    а модель между её предложениями никто не трогает.
+    """
+    with trace(trace_id):
+        chunks = list(steps)
+    yield from chunks
@@ -1,22 +1,62 @@
-import torch
+import asyncio
+import os
 import pickle
+import time
 import snappy
 import io
 
-from preprocessing import made_audio
-from filter import compres
-import schemas
+from loguru import logger
 
-from fastapi import APIRouter, Depends, UploadFile, File
-from fastapi.responses import StreamingResponse
+from pipeline import stream, sample_rate, take_complete
+from scheduler import scheduler, priority, QueueFull, DeadlineExceeded
+from filter import compres, to_pcm16, wav_header
+import warmup
+import metrics
+import profiling
+import cache
+from singleflight import inflight
+import prerender
+import backends
+import dsp
+import schemas
+import config
 
-from TTS.api import TTS
-# from TTS.bin.synthesize_new import main_tts
-# from synthesize_new import main_tts
-from transformers import VitsModel, VitsTokenizer
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException, Query, Request, Response
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 
 router = APIRouter()
 
+@router.get('/health')
+async def health():
+    return warmup.status()
+
+@router.get('/ready')
+async def ready():
+    if not warmup.is_ready():
+        return JSONResponse(status_code=503, content=warmup.status())
+    return warmup.status()
+
+@router.get('/metrics')
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@router.get('/prerender')
+async def get_prerender():
+    return prerender.report()
+
+@router.get('/profile/{trace_id}')
+async def get_profile(trace_id: str, kind: str = 'chrome', x_api_key: str = Header(default=None)):
+    if not profiling.allowed(x_api_key):
+        raise HTTPException(status_code=403, detail='Нужен админский ключ')
+    if kind not in ('chrome', 'speedscope') or not trace_id.isalnum():
+        raise HTTPException(status_code=400, detail='Неверный запрос')
+    path = profiling.trace_path(trace_id, kind)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail='Профиль не найден')
+    return FileResponse(path, media_type='application/json')
+
 @router.post('/load')
 async def load_file(file: UploadFile):
     file_path = "./TTS/tests/data/ssml/input.ssml"
@@ -28,9 +68,114 @@ async def load_file(file: UploadFile):
     
     return {"file_path": file_path}
 
+async def wait_result(future, http_request, deadline, cancel=None):
+    """Ожидание синтеза с отменой при отключении клиента или по дедлайну
+    :param cancel: вместо future.cancel(), например Flight.leave для общей задачи
+    """
+    result = asyncio.wrap_future(future)
+    while not result.done():
+        await asyncio.wait({result}, timeout=config.DISCONNECT_POLL)
+        if result.done():
+            break
+        if await http_request.is_disconnected() or time.monotonic() > deadline:
+            (cancel or future.cancel)()
+            return None
+    return result.result()
+
+def encode(audio, sample_rate, lang, target_rate=None):
+    # передискретизация в том же проходе, до перевода в int16
+    if target_rate is not None and target_rate != sample_rate:
+        with metrics.stage('resample', lang):
+            audio = dsp.resample(audio, sample_rate, target_rate)
+        sample_rate = target_rate
+    with metrics.stage('filter', lang):
+        compressed_audio = compres(audio, sample_rate)
+    compressed_audio.export("./server.wav", format='wav')
+
+    with metrics.stage('encode', lang):
+        byte_buffer = io.BytesIO()
+        compressed_audio.export(byte_buffer, format="wav")
+    return byte_buffer.getvalue()
+
+def pcm_chunk(wav, rate, target_rate):
+    if target_rate != rate:
+        wav = dsp.resample(wav, rate, target_rate)
+    return to_pcm16(wav)
+
+def pcm_stream(resampler, wav=None):
+    """PCM очередной части потока через общий для потока ресемплер
+    (без щелчков на стыках); wav=None - хвост в конце потока
+    """
+    return to_pcm16(resampler.flush() if wav is None else resampler.process(wav))
+
+async def stream_audio(flight, rate, cache_key=None, target_rate=None):
+    """Потоковая отдача: заголовок WAV и PCM каждого предложения по готовности.
+    С cache_key полностью отданное аудио сохраняется в кэш.
+    Если синтез не завершился (ошибка, дедлайн), соединение обрывается без
+    завершающего чанка: клиент видит ошибку, а не укороченное объявление.
+    """
+    target_rate = target_rate or rate
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    future = flight.future
+    flight.subscribe(lambda wav: loop.call_soon_threadsafe(queue.put_nowait, wav))
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+
+    async def body():
+        metrics.IN_FLIGHT.inc()
+        audio = []
+        resampler = dsp.StreamResampler(rate, target_rate)
+        try:
+            yield wav_header(target_rate)
+            while True:
+                wav = await queue.get()
+                if wav is None:
+                    break
+                if cache_key is not None:
+                    audio += wav
+                pcm = await run_in_threadpool(pcm_stream, resampler, wav)
+                if pcm:
+                    yield pcm
+            error = 'задача отменена' if future.cancelled() else future.exception()
+            if error is not None:
+                reason = ('cancelled' if future.cancelled()
+                          else 'deadline' if isinstance(error, DeadlineExceeded) else 'error')
+                metrics.STREAM_ABORTED.labels(reason).inc()
+                logger.error(f'Потоковый ответ оборван: синтез не завершён ({error})')
+                raise RuntimeError(f'Синтез не завершён: {error}')
+            tail = pcm_stream(resampler)
+            if tail:
+                yield tail
+            if cache_key is not None:
+                cache.responses.put(cache_key, audio, rate)
+        finally:
+            # клиент отключился или поток дочитан; для завершённой задачи no-op
+            flight.leave()
+            metrics.IN_FLIGHT.dec()
+    return body()
+
+def stretch(audio, speed, lang):
+    with metrics.stage('time_stretch', lang):
+        return dsp.time_stretch(audio, speed)
+
+async def respond(audio, rate, lang, as_stream, target_rate=None):
+    target_rate = target_rate or rate
+    if as_stream:
+        pcm = await run_in_threadpool(pcm_chunk, audio, rate, target_rate)
+        return StreamingResponse(iter([wav_header(target_rate), pcm]), media_type="audio/wav")
+    audio_bytes = await run_in_threadpool(encode, audio, rate, lang, target_rate)
+    headers = { "Content-Disposition": "attachment; filename=audio.wav" }
+    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav", headers=headers)
+
 @router.post('/tts')
-async def main(request: schemas.Item, params: schemas.TTSParams = Depends()) -> None:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+async def main(request: schemas.Item, http_request: Request, params: schemas.TTSParams = Depends(),
+               x_api_key: str = Header(default=None),
+               x_request_timeout: float = Header(default=None),
+               x_profile: bool = Header(default=False)) -> None:
+    try:
+        config.check_lang(params.lang)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     data = ''
     file_path = ''
     if not params.ssml:
@@ -38,64 +183,199 @@ async def main(request: schemas.Item, params: schemas.TTSParams = Depends()) ->
     else:
         file_path = './TTS/tests/data/ssml/input.ssml'
 
-    audio = []
-    sample_rate = 24000
-    if params.lang == 'ja':
-        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-        s_new = data.split("。")
-        if s_new[-1] == '':
-            s_new.pop()
-        for i in range(len(s_new)):
-            wav = tts.tts(text=s_new[i], speaker_wav="./output.wav", language='ja')
-            # wav = main_tts(s_new[i], "tts_models/multilingual/multi-dataset/xtts_v2", "server.wav", "/home/ubuntu/projects/kp.zuev/voicegen/TTSC/recipes/ljspeech/audio_shar/A7-RU.mp3", 'ja')
-            audio += wav
-    elif params.lang == 'zh-cn':
-        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-        s_new = data.split("。")
-        if s_new[-1] == '':
-            s_new.pop()
-        for i in range(len(s_new)):
-            wav = tts.tts(text=s_new[i], speaker_wav="./output.wav", language='zh-cn')
-            # wav = main_tts(s_new[i], "tts_models/multilingual/multi-dataset/xtts_v2", "server.wav", "/home/ubuntu/projects/kp.zuev/voicegen/TTSC/recipes/ljspeech/audio_shar/A7-RU.mp3", 'zh-cn')
-            audio += wav
-    elif params.lang == 'kaz':
-        sample_rate = 16000
-        model1 = VitsModel.from_pretrained("facebook/mms-tts-kaz")
-        tokenizer = VitsTokenizer.from_pretrained("facebook/mms-tts-kaz")
-        s_new = data.split(".")
-        if s_new[-1] == '':
-            s_new.pop()
-        for i in range(len(s_new)):
-            inputs = tokenizer(s_new[i], return_tensors="pt")
-            input_ids = inputs["input_ids"]
-            with torch.no_grad():
-                outputs = model1(input_ids)
-            audio += outputs.waveform[0]
-    elif params.lang == 'grc':
-        sample_rate = 16000
-        model1 = VitsModel.from_pretrained("facebook/mms-tts-grc")
-        tokenizer = VitsTokenizer.from_pretrained("facebook/mms-tts-grc")
-        s_new = data.split(".")
-        if s_new[-1] == '':
-            s_new.pop()
-        for i in range(len(s_new)):
-            inputs = tokenizer(s_new[i], return_tensors="pt")
-            input_ids = inputs["input_ids"]
-            with torch.no_grad():
-                outputs = model1(input_ids)
-            audio += outputs.waveform[0]
-    else:
-        audio = made_audio(data, params.lang, file_path)
-    
-    compressed_audio = compres(audio, sample_rate)
-    compressed_audio.export("./server.wav", format='wav')
+    if params.sample_rate is not None and params.sample_rate not in config.OUTPUT_RATES:
+        raise HTTPException(status_code=400, detail=f'Неподдерживаемая частота {params.sample_rate}')
+    speed = min(max(params.speed, config.SPEED_MIN), config.SPEED_MAX)
 
-    byte_buffer = io.BytesIO()
-    compressed_audio.export(byte_buffer, format="wav")
+    if x_profile:
+        if not profiling.allowed(x_api_key):
+            raise HTTPException(status_code=403, detail='Профилирование доступно только с админским ключом')
+        # срочная задача планировщика, мимо кэша и объединения запросов
+        trace_id = profiling.new_trace_id()
+        with metrics.IN_FLIGHT.track_inprogress():
+            deadline = time.monotonic() + (x_request_timeout or params.timeout or config.REQUEST_TIMEOUT)
+            steps = profiling.traced(trace_id, stream(data, params.lang, file_path, speed=speed))
+            future = scheduler.submit(steps, config.PRIORITIES['urgent'], deadline)
+            try:
+                audio = await wait_result(future, http_request, deadline)
+            except DeadlineExceeded as e:
+                raise HTTPException(status_code=504, detail=str(e))
+            if audio is None:
+                return Response(status_code=499)
+            response = await respond(audio, sample_rate(params.lang), params.lang, params.stream, params.sample_rate)
+        response.headers['X-Trace-Id'] = trace_id
+        return response
+    # кэшируется аудио в обычном темпе, другой темп получается из него растяжением
+    cache_key = None if params.ssml else cache.key(data, params.lang)
+    cached = cache.responses.get(cache_key) if cache_key is not None else None
+    if cache_key is not None:
+        prerender.observe(cache_key, cached is not None)
+    if cached is not None:
+        with metrics.IN_FLIGHT.track_inprogress():
+            audio, rate = cached
+            if speed != 1.0:
+                audio = await run_in_threadpool(stretch, audio, speed, params.lang)
+            response = await respond(audio, rate, params.lang, params.stream, params.sample_rate)
+        # X-Cache: hit - из кэша, shared - ждали чужой синтез, miss - свой синтез
+        response.headers['X-Cache'] = 'hit'
+        return response
+    # одинаковые одновременные запросы ждут один синтез
+    flight_key = None if params.ssml else cache.key(data, params.lang, speed=speed)
+    if speed != 1.0:
+        cache_key = None
 
-    audio_bytes = byte_buffer.getvalue()
-    headers = { "Content-Disposition": "attachment; filename=audio.wav" }
-    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav", headers=headers)
+    with metrics.IN_FLIGHT.track_inprogress():
+        timeout = x_request_timeout or params.timeout or config.REQUEST_TIMEOUT
+        deadline = time.monotonic() + timeout
+        try:
+            prio = priority(params.priority, x_api_key)
+
+            def submit(on_chunk):
+                # инкрементальный вывод нужен только потоковому ответу
+                steps = stream(data, params.lang, file_path, speed=speed,
+                               incremental=params.stream and config.XTTS_INCREMENTAL)
+                future = scheduler.submit(steps, prio, deadline, on_chunk=on_chunk)
+                # модель грузится, пока задача ждёт в очереди; отклонённому запросу не нужна
+                backends.get(params.lang).prefetch()
+                return future
+            flight, shared = inflight.join(flight_key, submit,
+                                           on_join=lambda f: scheduler.promote(f.future, prio, deadline))
+            if shared:
+                cache_key = None
+            if params.stream:
+                body = await stream_audio(flight, sample_rate(params.lang), cache_key, params.sample_rate)
+                return StreamingResponse(body, media_type="audio/wav",
+                                         headers={'X-Cache': 'shared' if shared else 'miss'})
+        except PermissionError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        try:
+            done = await wait_result(flight.future, http_request, deadline, cancel=flight.leave)
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        if done is None:
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=504, detail='Истёк срок ожидания запроса')
+            # клиент отключился, ответ никто не прочитает
+            return Response(status_code=499)
+
+        # части копятся во Flight, их получает каждый присоединившийся запрос
+        audio = flight.audio()
+        if cache_key is not None:
+            cache.responses.put(cache_key, audio, sample_rate(params.lang))
+        response = await respond(audio, sample_rate(params.lang), params.lang, False, params.sample_rate)
+    response.headers['X-Cache'] = 'shared' if shared else 'miss'
+    return response
     # compressed_data = snappy.compress(audio_bytes)
     # headers = { "Content-Disposition": "attachment; filename=compressed_audio.snappy" }
     # return StreamingResponse(io.BytesIO(compressed_data), media_type="application/octet-stream", headers=headers)
+
+@router.websocket('/tts/ws')
+async def tts_ws(websocket: WebSocket,
+                 lang: str = Query('ru'),
+                 prio_name: str = Query(default=None, alias='priority'),
+                 speed: float = Query(default=1.0),
+                 target_rate: int = Query(default=None, alias='sample_rate'),
+                 x_api_key: str = Header(default=None)):
+    """Инкрементальный синтез: текст приходит частями, аудио уходит по готовности предложений.
+
+    Клиент шлёт текстовые сообщения {"text": "...", "final": false}; законченные
+    предложения сразу ставятся в очередь синтеза, final=true досинтезирует остаток.
+    Сервер отвечает {"sample_rate": ..., "format": "pcm_s16le"}, затем бинарными
+    кадрами PCM по предложениям и {"done": true} в конце.
+    Не больше config.WS_MAX_PENDING порций ждут отправки: если клиент не успевает
+    читать аудио, сервер перестаёт читать текст.
+    """
+    # до sample_rate: он создаёт бэкенд языка
+    try:
+        config.check_lang(lang)
+    except ValueError:
+        # reason ограничен 123 байтами, язык приходит от клиента
+        await websocket.close(code=1008, reason='Неизвестный язык')
+        return
+    rate = sample_rate(lang)
+    if target_rate is not None and target_rate not in config.OUTPUT_RATES:
+        await websocket.close(code=1008, reason=f'Неподдерживаемая частота {target_rate}')
+        return
+    target_rate = target_rate or rate
+    try:
+        prio = priority(prio_name, x_api_key)
+    except (ValueError, PermissionError) as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    speed = min(max(speed, config.SPEED_MIN), config.SPEED_MAX)
+    await websocket.accept()
+    await websocket.send_json({'sample_rate': target_rate, 'format': 'pcm_s16le', 'channels': 1})
+
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue()
+    slots = asyncio.Semaphore(config.WS_MAX_PENDING)
+    futures = []
+
+    def submit(text):
+        chunks = asyncio.Queue()
+        future = scheduler.submit(stream(text, lang, speed=speed), prio, time.monotonic() + config.REQUEST_TIMEOUT,
+                                  on_chunk=lambda wav: loop.call_soon_threadsafe(chunks.put_nowait, wav))
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(chunks.put_nowait, None))
+        futures.append(future)
+        return future, chunks
+
+    async def reader():
+        buffer = ''
+        while True:
+            message = await websocket.receive_json()
+            buffer += message.get('text', '')
+            final = bool(message.get('final', False))
+            ready, buffer = (buffer, '') if final else take_complete(buffer, lang)
+            if ready.strip():
+                await slots.acquire()
+                await pending.put(submit(ready))
+            if final:
+                await pending.put(None)
+                return
+
+    async def writer():
+        # один ресемплер на соединение: предложения - части одного сигнала
+        resampler = dsp.StreamResampler(rate, target_rate)
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            future, chunks = item
+            while True:
+                wav = await chunks.get()
+                if wav is None:
+                    break
+                pcm = await run_in_threadpool(pcm_stream, resampler, wav)
+                # send_bytes ждёт, пока клиент разберёт буфер сокета
+                if pcm:
+                    await websocket.send_bytes(pcm)
+            future.result()
+            slots.release()
+        tail = pcm_stream(resampler)
+        if tail:
+            await websocket.send_bytes(tail)
+        await websocket.send_json({'done': True})
+
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(writer())]
+    metrics.IN_FLIGHT.inc()
+    try:
+        await asyncio.gather(*tasks)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except QueueFull as e:
+        await websocket.send_json({'error': str(e), 'retry_after': e.retry_after})
+        await websocket.close(code=1013)
+    except (DeadlineExceeded, ValueError) as e:
+        await websocket.send_json({'error': str(e)})
+        await websocket.close(code=1011)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for future in futures:
+            future.cancel()
+        metrics.IN_FLIGHT.dec()
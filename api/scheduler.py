@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future
+
+from loguru import logger
+
+import metrics
+import config
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Очередь заполнена, повторите через {retry_after} с')
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, steps, priority, deadline=None, on_chunk=None):
+        self.steps = steps
+        self.priority = priority
+        # потоковая отдача: шаги передаются сразу и не копятся в audio
+        self.on_chunk = on_chunk
+        # time.monotonic(), после которого результат уже никому не нужен
+        self.deadline = deadline
+        self.audio = []
+        self.future = Future()
+        # суммарное время шагов без ожидания в очереди
+        self.busy = 0.0
+
+
+class Scheduler:
+    """Очередь синтеза с приоритетами.
+
+    Задача - генератор, каждый шаг которого синтезирует одно предложение.
+    После каждого шага воркер берёт самую приоритетную задачу, поэтому срочное
+    объявление ждёт не всю длинную задачу, а только текущее предложение.
+    Внутри одного приоритета порядок FIFO.
+
+    Перед каждым шагом проверяется, не отменён ли Future (клиент отключился)
+    и не прошёл ли дедлайн; такая задача снимается, генератор закрывается.
+    """
+
+    def __init__(self, workers=1, depth=16):
+        self.depth = depth
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._job_time = 1.0
+        # Future -> Job для задач в очереди и в работе
+        self._jobs = {}
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def pending(self):
+        return self._pending
+
+    def retry_after(self):
+        return max(1, math.ceil(self._pending * self._job_time / len(self._threads)))
+
+    def submit(self, steps, priority, deadline=None, on_chunk=None):
+        """Ставит генератор шагов в очередь, возвращает Future с аудио.
+        Future.cancel() снимает задачу на ближайшей границе шагов.
+        on_chunk(wav) вызывается из потока воркера после каждого шага.
+        """
+        with self._cond:
+            # срочные объявления принимаются всегда
+            if priority > 0 and self._pending >= self.depth:
+                raise QueueFull(self.retry_after())
+            job = Job(steps, priority, deadline, on_chunk)
+            self._jobs[job.future] = job
+            self._pending += 1
+            metrics.QUEUE_DEPTH.set(self._pending)
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._cond.notify()
+        job.future.add_done_callback(lambda _: self._done(job))
+        return job.future
+
+    def promote(self, future, priority, deadline=None):
+        """Задача нужна ещё одному запросу: приоритет - более срочный из двух,
+        дедлайн - более поздний (None - без дедлайна)
+        """
+        with self._cond:
+            job = self._jobs.get(future)
+            if job is None:
+                return
+            if job.deadline is not None:
+                job.deadline = None if deadline is None else max(job.deadline, deadline)
+            if priority >= job.priority:
+                return
+            job.priority = priority
+            # задача в очереди переставляется сразу, выполняемая - после шага
+            for i, (_, seq, queued) in enumerate(self._heap):
+                if queued is job:
+                    self._heap[i] = (priority, seq, job)
+                    heapq.heapify(self._heap)
+                    break
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, seq, job = heapq.heappop(self._heap)
+            if job.future.cancelled():
+                job.steps.close()
+                continue
+            if job.deadline is not None and time.monotonic() > job.deadline:
+                job.steps.close()
+                self._resolve(job, exception=DeadlineExceeded('Истёк срок ожидания запроса'))
+                continue
+            t0 = time.perf_counter()
+            try:
+                wav = next(job.steps)
+            except StopIteration:
+                self._resolve(job, result=job.audio)
+                continue
+            except Exception as e:
+                logger.exception('Ошибка синтеза')
+                self._resolve(job, exception=e)
+                continue
+            job.busy += time.perf_counter() - t0
+            if job.on_chunk is not None:
+                job.on_chunk(wav)
+            else:
+                job.audio += wav
+            with self._cond:
+                heapq.heappush(self._heap, (job.priority, seq, job))
+                self._cond.notify()
+
+    @staticmethod
+    def _resolve(job, result=None, exception=None):
+        # Future мог быть отменён из другого потока прямо во время шага
+        if not job.future.set_running_or_notify_cancel():
+            return
+        if exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(result)
+
+    def _done(self, job):
+        with self._cond:
+            self._pending -= 1
+            self._jobs.pop(job.future, None)
+            metrics.QUEUE_DEPTH.set(self._pending)
+            # скользящее среднее времени задачи для Retry-After
+            self._job_time = 0.8 * self._job_time + 0.2 * job.busy
+
+
+def priority(name, api_key=None):
+    """Класс приоритета из параметра запроса или по API ключу.
+    Явный класс не срочнее класса ключа (без ключа - normal, админскому можно urgent).
+    Срочный обходит лимит очереди, поэтому без права на него PermissionError,
+    остальные понижаются до класса ключа
+    """
+    own = config.API_KEYS.get(api_key, 'normal')
+    if name is None:
+        return config.PRIORITIES[own]
+    if name not in config.PRIORITIES:
+        raise ValueError(f'Неизвестный приоритет {name}')
+    limit = config.PRIORITIES['urgent' if api_key in config.ADMIN_KEYS else own]
+    if config.PRIORITIES[name] >= limit:
+        return config.PRIORITIES[name]
+    if name == 'urgent':
+        raise PermissionError('Срочный приоритет доступен только с ключом срочного класса')
+    return limit
+
+
+scheduler = Scheduler(config.SCHEDULER_WORKERS, config.QUEUE_DEPTH)
@@ -16,7 +16,26 @@ class TTSParams():
         ssml: bool = Query(default=False,
                            description="Если был передан ssml файл на английском языке, то установите True",
                            ),
+        priority: str = Query(default=None,
+                              description="Приоритет: urgent,normal,bulk. По умолчанию по API ключу или normal",
+                              example="normal"),
+        timeout: float = Query(default=None,
+                               description="Срок выполнения запроса в секундах, также заголовок X-Request-Timeout",
+                               example=60),
+        stream: bool = Query(default=False,
+                             description="Отдавать аудио по мере синтеза предложений (без постобработки всего файла)"),
+        speed: float = Query(default=1.0,
+                             description="Темп речи, 1 - обычный, ограничивается диапазоном 0.5-2",
+                             example=1.0),
+        sample_rate: int = Query(default=None,
+                                 description="Частота дискретизации ответа: 8000,16000,22050,24000,44100,48000. По умолчанию частота модели",
+                                 example=16000),
     ):
         # self.filter = filter
         self.lang = lang
         self.ssml = ssml
+        self.priority = priority
+        self.timeout = timeout
+        self.stream = stream
+        self.speed = speed
+        self.sample_rate = sample_rate
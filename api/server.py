@@ -1,10 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
+import multiprocessing
+import threading
+import argparse
+import os
 import uvicorn
 import socket
 import logging
+import glob
+import tempfile
 import routers
+import warmup
+import fanout
+import prerender
+import config
 import sys
 
 class InterceptHandler(logging.Handler):
@@ -48,11 +58,58 @@ app.add_middleware(
 
 app.include_router(routers.router, prefix=base_app_prefix)
 
+@app.on_event('startup')
+def startup():
+    # Прогрев в отдельном потоке, чтобы /api/health отвечал сразу
+    if config.WARMUP:
+        threading.Thread(target=warmup.run, daemon=True).start()
+    else:
+        warmup.skip()
+    if config.FANOUT_WORKERS:
+        threading.Thread(target=fanout.start, daemon=True).start()
+    if config.PRERENDER_SCHEDULE:
+        threading.Thread(target=prerender.run, daemon=True).start()
+
+def serve_worker(index, sock, cores):
+    # Каждый воркер работает на своих ядрах с числом потоков torch по их количеству
+    config.pin_process(cores)
+    logger.info(f'Воркер {index} (pid {os.getpid()}): ядра {cores}')
+    server = uvicorn.Server(uvicorn.Config(app))
+    server.run(sockets=[sock])
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
-    host = '0.0.0.0'
-    port = 9001
+    parser = argparse.ArgumentParser("server")
+    parser.add_argument("--host", default='0.0.0.0')
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('TTS_WORKERS', 1)),
+                        help="число процессов; веса моделей общие через mmap")
+    args = parser.parse_args()
+    host = args.host
+    port = args.port
 
     logger.info(f'Сервис запущен ip: {host}:{port}')
 
-    uvicorn.run(app, host=host, port=port)
+    if args.workers == 1:
+        uvicorn.run(app, host=host, port=port)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        # метрики воркеров в общем каталоге, иначе /api/metrics отдаёт случайный воркер;
+        # переменная нужна до импорта prometheus_client в дочерних процессах
+        metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='tts-metrics-'))
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+        ctx = multiprocessing.get_context('spawn')
+        processes = [ctx.Process(target=serve_worker, args=(i, sock, cores))
+                     for i, cores in enumerate(config.split_cores(args.workers))]
+        for p in processes:
+            p.start()
+        from prometheus_client import multiprocess
+        for p in processes:
+            p.join()
+            multiprocess.mark_process_dead(p.pid)
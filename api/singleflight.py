@@ -0,0 +1,94 @@
+import threading
+
+import metrics
+
+
+class Flight:
+    """Одна задача синтеза и все запросы, которые ждут её результат"""
+
+    def __init__(self):
+        self.future = None
+        self.chunks = []
+        self._listeners = []
+        self._waiters = 1
+        self._lock = threading.Lock()
+
+    def publish(self, wav):
+        # on_chunk планировщика, вызывается из потока воркера
+        with self._lock:
+            self.chunks.append(wav)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(wav)
+
+    def subscribe(self, listener):
+        """listener(wav) для уже готовых и будущих частей, по порядку"""
+        with self._lock:
+            for wav in self.chunks:
+                listener(wav)
+            self._listeners.append(listener)
+
+    def audio(self):
+        with self._lock:
+            return [x for wav in self.chunks for x in wav]
+
+    def join(self):
+        with self._lock:
+            if self._waiters == 0 or self.future.cancelled():
+                return False
+            self._waiters += 1
+            return True
+
+    def leave(self):
+        """Запрос больше не ждёт; задача отменяется, когда уходит последний"""
+        with self._lock:
+            self._waiters -= 1
+            last = self._waiters == 0
+        if last:
+            self.future.cancel()
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов в один синтез.
+
+    Ключ - cache.key (нормализованный текст, язык, голос, опции). Пока задача
+    с таким ключом не завершена, новые запросы получают её Flight вместо
+    своей задачи; on_join поднимает её приоритет и продлевает дедлайн
+    под присоединившийся запрос (см. Scheduler.promote).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, submit, on_join=None):
+        """
+        :param key: ключ запроса; None - без объединения
+        :param submit: submit(on_chunk) -> Future, ставит задачу в очередь
+        :param on_join: on_join(flight) при присоединении к чужой задаче
+        :return: (flight, shared) - shared=True, если присоединились к чужой задаче
+        """
+        with self._lock:
+            flight = self._flights.get(key) if key is not None else None
+            shared = flight is not None and flight.join()
+            if not shared:
+                flight = Flight()
+                flight.future = submit(flight.publish)
+                if key is not None:
+                    self._flights[key] = flight
+        if shared:
+            metrics.COALESCED_REQUESTS.inc()
+            if on_join is not None:
+                on_join(flight)
+            return flight, True
+        if key is not None:
+            flight.future.add_done_callback(lambda _: self._forget(key, flight))
+        return flight, False
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+inflight = SingleFlight()
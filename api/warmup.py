@@ -0,0 +1,52 @@
+import time
+
+from loguru import logger
+
+from pipeline import synthesize
+import models
+import config
+
+# Состояние прогрева, отдаётся в /api/health и /api/ready.
+# status: starting, warming, ready или degraded (прогрев части моделей не удался)
+STATE = {
+    'status': 'starting',
+    'warmed': [],
+    'errors': {},
+    'started': None,
+    'finished': None,
+}
+
+
+def is_ready():
+    return STATE['status'] == 'ready'
+
+
+def run():
+    """Загрузка моделей и пробный синтез для каждого языка и голоса"""
+    STATE['status'] = 'warming'
+    STATE['started'] = time.time()
+    for lang in config.WARMUP_LANGS:
+        cfg = config.lang_config(lang)
+        voices = list(config.VOICES) if cfg['backend'] == 'xtts' else ['default']
+        text = config.WARMUP_TEXT.get(lang, config.WARMUP_TEXT['en'])
+        for voice in voices:
+            name = f'{lang}/{voice}'
+            try:
+                t0 = time.time()
+                synthesize(text, lang, voice=voice)
+                logger.info(f'Прогрев {name}: {time.time() - t0:.2f} с')
+                STATE['warmed'].append(name)
+            except Exception as e:
+                logger.exception(f'Ошибка прогрева {name}')
+                STATE['errors'][name] = str(e)
+    STATE['finished'] = time.time()
+    # без одной из моделей сервис не готов: /api/ready отвечает 503
+    STATE['status'] = 'degraded' if STATE['errors'] else 'ready'
+
+
+def skip():
+    STATE['status'] = 'ready'
+
+
+def status():
+    return dict(STATE, loaded=models.loaded(), models=models.resident())
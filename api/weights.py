@@ -0,0 +1,67 @@
+import fcntl
+import os
+
+import torch
+from loguru import logger
+
+import config
+
+
+def mmap_path(name):
+    return os.path.join(config.WEIGHTS_DIR, name.replace('/', '_') + '.pt')
+
+
+def _tensors(model):
+    # remove_duplicate=False сохраняет связанные веса под всеми именами,
+    # torch.save запишет общий storage один раз
+    tensors = dict(model.named_parameters(remove_duplicate=False))
+    tensors.update(model.named_buffers(remove_duplicate=False))
+    return {k: v.detach() for k, v in tensors.items()}
+
+
+def _export(model, path):
+    logger.info(f'Сохранение весов в {path}')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    torch.save({k: v.cpu() for k, v in _tensors(model).items()}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def ensure(name, build):
+    """Путь к файлу весов; при его отсутствии build() строит модель и она сохраняется.
+
+    Воркеры стартуют одновременно: файл пишет один процесс под flock, остальные
+    ждут и полную копию модели не строят.
+    """
+    path = mmap_path(name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                model = build()
+                _export(model, path)
+                del model
+    return path
+
+
+def load_into(model, name):
+    """Веса модели, построенной на meta device, из отображённого в память файла.
+
+    Тензоры присваиваются модулям как есть (без копирования), страницы файла
+    лежат в page cache и общие для всех процессов. Только для CPU.
+    """
+    path = mmap_path(name)
+    tensors = torch.load(path, mmap=True, weights_only=True, map_location='cpu')
+    for key, tensor in tensors.items():
+        module_name, _, attr = key.rpartition('.')
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+    missing = [k for k, v in _tensors(model).items() if v.is_meta]
+    if missing:
+        raise RuntimeError(f'В {path} нет весов: {", ".join(missing[:5])}')
+    logger.info(f'Веса {name} отображены из {path}')
+    return model
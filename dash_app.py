@@ -1,15 +1,24 @@
 import datetime
+import diskcache
 import httpx
 import dash
 import os
+import tempfile
 
 import dash_bootstrap_components as dbc
 
 from dash.dependencies import Input, Output, State
-from flask import send_from_directory
-from dash import dcc, html
+from flask import send_from_directory, request, abort
+from pydub import AudioSegment
+from werkzeug.utils import safe_join
+from dash import dcc, html, DiskcacheManager, no_update, ctx
 
-app = dash.Dash(__name__)
+import history
+
+# Генерация идёт в фоновом процессе, поток Flask освобождается сразу
+background_callback_manager = DiskcacheManager(diskcache.Cache("./cache"))
+
+app = dash.Dash(__name__, background_callback_manager=background_callback_manager)
 
 server = app.server
 
@@ -27,31 +36,59 @@ LANGUAGES = {
 }
 GENERATING = False
 AUDIO_DIR = "/home/teslaa2/projects/kp.zuev/voicegen/TTSC/TTSC/bin/Dash/"
-SAVED_AUDIO = []
+# База истории - вне AUDIO_DIR, который раздаётся через /audio/
+HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.sqlite")
+PAGE_SIZE = 20
+VARIANT_DIR = os.path.join(AUDIO_DIR, "variants")
+# Сжатые варианты для прослушивания истории: mimetype, расширение, параметры ffmpeg
+AUDIO_FORMATS = {
+    'opus': ('audio/ogg', 'ogg', {'codec': 'libopus', 'bitrate': '32k'}),
+    'mp3': ('audio/mpeg', 'mp3', {'bitrate': '64k'}),
+}
+# Имена файлов уникальны (время генерации), содержимое не меняется
+AUDIO_MAX_AGE = 365 * 24 * 3600
 AUDIO_URL = [None]
+# Оценка темпа речи для индикатора прогресса
+CHARS_PER_SEC = 15
 
 def extract_time(file_name):
     return datetime.datetime.strptime(file_name.split('.')[0], "%d-%m-%Y_%H-%M-%S_%f")
 
-def load_audio() -> None:
-    existing_files = [f for f in os.listdir(AUDIO_DIR) if f.endswith('.wav')]
-    sorted_files = sorted(existing_files, key=extract_time)
-    existing_files = sorted_files.copy()
-    for file in existing_files:
-        text_path = os.path.join(AUDIO_DIR, f"{file[:-4]}.txt")
-        speed_path = os.path.join(AUDIO_DIR, f"speed_{file[:-4]}.txt")
-        text = "-"
-        speed = "-"
-        if os.path.exists(text_path):
-            with open(text_path, "r", encoding="utf-8") as text_file:
-                text = text_file.read()
-        if os.path.exists(speed_path):
-            with open(speed_path, "r", encoding="utf-8") as text_file:
-                speed = text_file.read()
-        SAVED_AUDIO.append({"text": text, "filename": file, "speed": speed})
-load_audio()
-
-def text_to_audio(data, lang, speed):
+def db():
+    conn = history.connect(HISTORY_DB)
+    # старые wav с txt рядом переносятся в базу один раз
+    history.import_dir(conn, AUDIO_DIR, extract_time)
+    return conn
+
+def audio_variant(filename, fmt):
+    """Путь к сжатому варианту wav, создаётся при первом обращении"""
+    wav_path = safe_join(AUDIO_DIR, filename)
+    _, ext, export_args = AUDIO_FORMATS[fmt]
+    variant_path = safe_join(VARIANT_DIR, f"{filename[:-4]}.{ext}")
+    if wav_path is None or variant_path is None or not os.path.exists(wav_path):
+        return None
+    if not os.path.exists(variant_path):
+        os.makedirs(VARIANT_DIR, exist_ok=True)
+        # свой временный файл на каждый запрос: сервер многопоточный
+        with tempfile.NamedTemporaryFile(dir=VARIANT_DIR, suffix=f".{ext}.tmp", delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            AudioSegment.from_wav(wav_path).export(tmp_path, format=ext, **export_args)
+            os.replace(tmp_path, variant_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return variant_path
+
+def fix_wav_header(audio_bytes):
+    # потоковый ответ приходит с размерами 0xFFFFFFFF, в файле пишем настоящие
+    audio_bytes = bytearray(audio_bytes)
+    if audio_bytes[40:44] == b'\xff\xff\xff\xff':
+        audio_bytes[4:8] = (len(audio_bytes) - 8).to_bytes(4, 'little')
+        audio_bytes[40:44] = (len(audio_bytes) - 44).to_bytes(4, 'little')
+    return bytes(audio_bytes)
+
+def text_to_audio(data, lang, speed, set_progress=None):
     request_data = {
         "text": data
     }
@@ -59,23 +96,32 @@ def text_to_audio(data, lang, speed):
         "voice": False,
         "lang": lang,
         "speed": speed,
+        "stream": True,
     }
     with httpx.Client(timeout=TIMEOUT) as client:
-        response = client.post(FASTAPI_URL, json=request_data, params=params)
-        if response.status_code == 200:
-            audio_bytes = response.content
-            time = datetime.datetime.now().strftime("%d-%m-%Y_%H-%M-%S_%f")
-            audio = f"{time}.wav"
-            with open(f"./Dash/{audio}", "wb") as audio_file:
-                audio_file.write(audio_bytes)
-            with open(f"./Dash/{audio[:-4]}.txt", "w", encoding="utf-8") as text_file:
-                text_file.write(data)
-            with open(f"./Dash/speed_{audio[:-4]}.txt", "w", encoding="utf-8") as speed_file:
-                speed_file.write(str(speed))
-            return audio
-        else:
-            print(f"{response.status_code}")
-            return None
+        with client.stream("POST", FASTAPI_URL, json=request_data, params=params) as response:
+            if response.status_code != 200:
+                print(f"{response.status_code}")
+                return None
+            audio_bytes = b''
+            for chunk in response.iter_bytes():
+                audio_bytes += chunk
+                if set_progress is not None and len(audio_bytes) >= 44:
+                    # прогресс по длительности полученного аудио относительно ожидаемой
+                    sample_rate = int.from_bytes(audio_bytes[24:28], 'little')
+                    expected = max(1.0, len(data) / CHARS_PER_SEC) * sample_rate * 2
+                    set_progress((str(min(95, int(100 * (len(audio_bytes) - 44) / expected))),))
+    now = datetime.datetime.now()
+    audio = f"{now.strftime('%d-%m-%Y_%H-%M-%S_%f')}.wav"
+    with open(f"./Dash/{audio}", "wb") as audio_file:
+        audio_file.write(fix_wav_header(audio_bytes))
+    conn = db()
+    history.add(conn, audio, data, speed, lang, now)
+    conn.close()
+    # варианты для истории готовим сразу, пока работаем в фоновом процессе
+    for fmt in AUDIO_FORMATS:
+        audio_variant(audio, fmt)
+    return audio
 
 sidebar = html.Div(
     [
@@ -116,6 +162,8 @@ content = html.Div([
                 children=[html.Button("Генерировать аудио", id="generate-button", n_clicks=0, style={'height': 45, 'width': '100%'}),
                           html.Div(id="loading-output")],
                 type="circle"),
+            html.Progress(id='progress-bar', value='0', max='100', style={'width': '100%', 'visibility': 'hidden'}),
+            dcc.Store(id='new-audio'),
 
         ], style={'display': 'flex', 'flexDirection': 'column', 'width': '40%'})
 
@@ -138,6 +186,13 @@ content = html.Div([
 
     html.Div([
         html.H3("Результаты"),
+        html.Div([
+            dcc.Input(id='history-search', type='search', debounce=True, placeholder='Поиск по тексту...', style={'width': '30%'}),
+            html.Button("<", id='history-prev', n_clicks=0, style={'margin-left': '20px'}),
+            html.Span(id='history-page-label', style={'margin': '0 10px'}),
+            html.Button(">", id='history-next', n_clicks=0),
+            dcc.Store(id='history-page', data=0),
+        ], style={'margin-bottom': '10px'}),
         html.Table([
             html.Thead(html.Tr([html.Th("Текст"), html.Th("Аудио")]))
         ], id='audio-table', style={'border': '1px solid black', 'border-collapse': 'collapse'})
@@ -168,50 +223,80 @@ app.layout = html.Div([
 ])
 
 @app.callback(
-    [
-        Output('audio-player', 'src'),
-        Output('audio-table', 'children'),
-        Output('loading-output', 'children'),
-        Output('generate-button', 'n_clicks'),
-    ],
-    [
-        Input('generate-button', 'n_clicks'),
-    ],
+    Output('new-audio', 'data'),
+    Input('generate-button', 'n_clicks'),
     [
         State('text-input', 'value'),
         State('language-dropdown', 'value'),
         State('speed-slider', 'value'),
     ],
+    background=True,
+    running=[
+        (Output('generate-button', 'disabled'), True, False),
+        (Output('progress-bar', 'style'), {'width': '100%', 'visibility': 'visible'}, {'width': '100%', 'visibility': 'hidden'}),
+    ],
+    progress=[Output('progress-bar', 'value')],
+    prevent_initial_call=True,
 )
-def generate_audio(n_clicks, text, lang, speed):
+def generate_audio(set_progress, n_clicks, text, lang, speed):
+    # Выполняется в фоновом процессе: запись в историю идёт в text_to_audio, new-audio обновляет страницу
     if n_clicks > 0 and text:
-        audio_file = text_to_audio(text, lang, speed)
-
-        AUDIO_URL[0] = f"/audio/{audio_file}"
-        SAVED_AUDIO.append({"text": text, "filename": audio_file, "speed": str(speed)})
-
-        audio_list = [
-            html.Tr([
-                html.Td(f"{i + 1}.", style={'width': '1%', 'border': '1px solid black'}),
-                html.Td(item['text'], style={'width': '60%', 'border': '1px solid black', 'padding-left': '5px'}),
-                html.Td(html.Audio(src=f"/audio/{item['filename']}", controls=True, style={'width': '50%', 'margin-top': '10px', 'padding-left': '40px'}), style={'width': '40%', 'border': '1px solid black'}),
-                html.Td("Скорость: "+item['speed'], style={'width': '9%', 'border': '1px solid black', 'padding-left': '5px'}),
-            ]) 
-            for i, item in enumerate(SAVED_AUDIO)
-        ]
-
-        return AUDIO_URL[0], audio_list, None, 0
+        set_progress(("0",))
+        audio_file = text_to_audio(text, lang, speed, set_progress)
+        if audio_file is not None:
+            return {"text": text, "filename": audio_file, "speed": str(speed)}
+    return no_update
+
+@app.callback(
+    [
+        Output('audio-player', 'src'),
+        Output('audio-table', 'children'),
+        Output('history-page', 'data'),
+        Output('history-page-label', 'children'),
+    ],
+    [
+        Input('new-audio', 'data'),
+        Input('history-search', 'value'),
+        Input('history-prev', 'n_clicks'),
+        Input('history-next', 'n_clicks'),
+    ],
+    State('history-page', 'data'),
+)
+def show_audio(new_audio, search, prev_clicks, next_clicks, page):
+    if new_audio is not None:
+        AUDIO_URL[0] = f"/audio/{new_audio['filename']}"
+    if ctx.triggered_id == 'history-prev':
+        page = max(0, page - 1)
+    elif ctx.triggered_id == 'history-next':
+        page += 1
     else:
-        audio_list = [
-            html.Tr([
-                html.Td(f"{i + 1}.", style={'width': '1%', 'border': '1px solid black'}),
-                html.Td(item['text'], style={'width': '60%', 'border': '1px solid black', 'padding-left': '5px'}),
-                html.Td(html.Audio(src=f"/audio/{item['filename']}", controls=True, style={'width': '40%', 'margin-top': '10px', 'padding-left': '40px'}), style={'width': '40%', 'border': '1px solid black'}),
-                html.Td("Скорость: "+item['speed'], style={'width': '9%', 'border': '1px solid black', 'padding-left': '5px'}),
-            ])
-            for i, item in enumerate(SAVED_AUDIO)
-        ]
-        return AUDIO_URL[0], audio_list, None, 0
+        page = 0
+
+    conn = db()
+    try:
+        items, total = history.page(conn, search or '', page * PAGE_SIZE, PAGE_SIZE)
+        pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+        if page >= pages:
+            page = pages - 1
+            items, total = history.page(conn, search or '', page * PAGE_SIZE, PAGE_SIZE)
+    finally:
+        conn.close()
+
+    # preload="none": браузер не качает аудио, пока его не запустят
+    audio_list = [
+        html.Tr([
+            html.Td(f"{page * PAGE_SIZE + i + 1}.", style={'width': '1%', 'border': '1px solid black'}),
+            html.Td(item['text'], style={'width': '60%', 'border': '1px solid black', 'padding-left': '5px'}),
+            html.Td(html.Audio([
+                html.Source(src=f"/audio/{item['filename']}?format=opus", type='audio/ogg; codecs=opus'),
+                html.Source(src=f"/audio/{item['filename']}?format=mp3", type='audio/mpeg'),
+                html.Source(src=f"/audio/{item['filename']}", type='audio/wav'),
+            ], controls=True, preload='none', style={'width': '50%', 'margin-top': '10px', 'padding-left': '40px'}), style={'width': '40%', 'border': '1px solid black'}),
+            html.Td("Скорость: "+item['speed'], style={'width': '9%', 'border': '1px solid black', 'padding-left': '5px'}),
+        ])
+        for i, item in enumerate(items)
+    ]
+    return AUDIO_URL[0], audio_list, page, f"{page + 1} / {pages} (всего {total})"
 
 @app.callback(
     Output('page-content', 'children'),
@@ -228,7 +313,29 @@ def display_page(pathname):
 
 @app.server.route('/audio/<filename>')
 def server_audio(filename):
-    return send_from_directory("/home/teslaa2/projects/kp.zuev/voicegen/TTSC/TTSC/bin/Dash/", filename)
+    # в AUDIO_DIR лежат и тексты старой истории, отдаются только записи
+    if not filename.endswith('.wav'):
+        abort(404)
+    # Формат из ?format= или из Accept; wav первым, чтобы */* получал исходный файл
+    fmt = request.args.get('format')
+    if fmt is None:
+        best = request.accept_mimetypes.best_match(['audio/wav', 'audio/ogg', 'audio/mpeg'], default='audio/wav')
+        fmt = {'audio/ogg': 'opus', 'audio/mpeg': 'mp3'}.get(best)
+    elif fmt not in AUDIO_FORMATS:
+        abort(400)
+
+    if fmt is None:
+        response = send_from_directory(AUDIO_DIR, filename, conditional=True, etag=True, max_age=AUDIO_MAX_AGE)
+    else:
+        variant_path = audio_variant(filename, fmt)
+        if variant_path is None:
+            abort(404)
+        response = send_from_directory(VARIANT_DIR, os.path.basename(variant_path), mimetype=AUDIO_FORMATS[fmt][0],
+                                       conditional=True, etag=True, max_age=AUDIO_MAX_AGE)
+    # send_from_directory отвечает на Range (206) и If-None-Match (304) сам
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
 
 if __name__ == '__main__':
     app.run_server(debug=True, host='0.0.0.0', port=9005)
\ No newline at end of file
@@ -0,0 +1,92 @@
+import datetime
+import os
+import sqlite3
+
+# История генераций Dash приложения: SQLite с индексом по времени и FTS5 по тексту
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio (
+    id INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    text TEXT NOT NULL,
+    speed TEXT NOT NULL,
+    lang TEXT,
+    created TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audio_created ON audio(created);
+CREATE VIRTUAL TABLE IF NOT EXISTS audio_fts USING fts5(text, content='audio', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS audio_ai AFTER INSERT ON audio BEGIN
+    INSERT INTO audio_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS audio_ad AFTER DELETE ON audio BEGIN
+    INSERT INTO audio_fts(audio_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL: фоновые процессы пишут, пока страница читает
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def add(conn, filename, text, speed, lang, created=None):
+    created = created or datetime.datetime.now()
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO audio(filename, text, speed, lang, created) VALUES (?, ?, ?, ?, ?)",
+            (filename, text, str(speed), lang, created.isoformat()),
+        )
+
+
+def _fts_query(search):
+    # каждое слово как префикс, кавычки экранируются; слова из одной пунктуации
+    # токенайзер FTS5 отбрасывает, пустой запрос - синтаксическая ошибка
+    words = [w for w in search.replace('"', ' ').split() if any(c.isalnum() for c in w)]
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def page(conn, search='', offset=0, limit=20):
+    """Записи от новых к старым и их общее число; поиск без слов - все записи"""
+    query = _fts_query(search or '')
+    if query:
+        where = "WHERE id IN (SELECT rowid FROM audio_fts WHERE audio_fts MATCH ?)"
+        args = (query,)
+    else:
+        where, args = "", ()
+    total = conn.execute(f"SELECT COUNT(*) FROM audio {where}", args).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT * FROM audio {where} ORDER BY created DESC LIMIT ? OFFSET ?", args + (limit, offset)
+    ).fetchall()
+    return [dict(row) for row in rows], total
+
+
+def import_dir(conn, audio_dir, extract_time):
+    """Однократный перенос старой истории: wav + {name}.txt + speed_{name}.txt"""
+    if conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone() is not None:
+        return
+    if os.path.isdir(audio_dir):
+        for file in os.listdir(audio_dir):
+            if not file.endswith('.wav'):
+                continue
+            text_path = os.path.join(audio_dir, f"{file[:-4]}.txt")
+            speed_path = os.path.join(audio_dir, f"speed_{file[:-4]}.txt")
+            text = "-"
+            speed = "-"
+            if os.path.exists(text_path):
+                with open(text_path, "r", encoding="utf-8") as text_file:
+                    text = text_file.read()
+            if os.path.exists(speed_path):
+                with open(speed_path, "r", encoding="utf-8") as text_file:
+                    speed = text_file.read()
+            try:
+                created = extract_time(file)
+            except ValueError:
+                created = datetime.datetime.fromtimestamp(os.path.getmtime(os.path.join(audio_dir, file)))
+            add(conn, file, text, speed, None, created)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('imported', ?)",
+                     (datetime.datetime.now().isoformat(),))
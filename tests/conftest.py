@@ -0,0 +1,8 @@
+import os
+import sys
+
+# модули сервиса импортируют друг друга по имени, как при запуске из api/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+# history.py и dash_app.py лежат в корне
+sys.path.insert(1, ROOT)
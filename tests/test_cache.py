@@ -0,0 +1,27 @@
+import numpy as np
+
+import cache
+
+
+def test_key_normalizes_whitespace():
+    assert cache.key('Добрый  день.\n', 'ru') == cache.key(' Добрый день.', 'ru')
+
+
+def test_key_depends_on_lang_voice_and_options():
+    base = cache.key('Добрый день.', 'ru')
+    assert base != cache.key('Добрый день.', 'en')
+    assert base != cache.key('Добрый день.', 'ru', voice='other')
+    assert base != cache.key('Добрый день.', 'ru', speed=1.5)
+    assert cache.key('Добрый день.', 'ru', a=1, b=2) == cache.key('Добрый день.', 'ru', b=2, a=1)
+
+
+def test_lru_evicts_by_size():
+    responses = cache.AudioCache(max_bytes=3 * 4 * 100)
+    for k in 'abc':
+        responses.put(k, np.zeros(100), 24000)
+    responses.get('a')
+    responses.put('d', np.zeros(100), 24000)
+    assert 'a' in responses and 'b' not in responses and 'd' in responses
+    # больше лимита целиком - не кладётся вовсе
+    responses.put('big', np.zeros(1000), 24000)
+    assert 'big' not in responses
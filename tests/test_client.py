@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from client import PCMFramer
+from filter import to_pcm16, wav_header
+
+
+def stream(samples, rate=22050):
+    return wav_header(rate) + to_pcm16(samples)
+
+
+def collect(framer, chunks):
+    frames = [frame for chunk in chunks for frame in framer.feed(chunk)]
+    tail = framer.flush()
+    return frames, tail
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 44, 4096])
+def test_frames_independent_of_chunking(chunk):
+    samples = np.linspace(-0.5, 0.5, 2500, dtype=np.float32)
+    data = stream(samples)
+    framer = PCMFramer(frame_size=1000)
+    frames, tail = collect(framer, [data[i:i + chunk] for i in range(0, len(data), chunk)])
+    assert framer.sample_rate == 22050
+    assert [len(f) for f in frames] == [1000, 1000] and len(tail) == 500
+    decoded = np.concatenate(frames + [tail])
+    assert np.abs(decoded - samples).max() < 1e-4
+
+
+def test_flush_without_tail():
+    framer = PCMFramer(frame_size=100)
+    frames, tail = collect(framer, [stream(np.zeros(200, dtype=np.float32))])
+    assert len(frames) == 2 and tail is None
+
+
+def test_not_wav():
+    with pytest.raises(RuntimeError):
+        PCMFramer().feed(b'<html>Internal Server Error</html>')
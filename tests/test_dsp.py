@@ -0,0 +1,81 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+import dsp
+
+
+def tone(freq, rate, seconds=1.0, amp=0.5):
+    return amp * np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate)
+
+
+def peak_freq(x, rate):
+    spectrum = np.abs(np.fft.rfft(x))
+    return np.argmax(spectrum) * rate / len(x)
+
+
+@pytest.mark.parametrize('source,target', [(24000, 16000), (16000, 24000), (24000, 8000), (22050, 48000)])
+def test_resample_length_and_pitch(source, target):
+    y = dsp.resample(tone(440, source), source, target)
+    assert y.dtype == np.float32
+    assert abs(len(y) - target) <= 1
+    assert abs(peak_freq(y, target) - 440) < 2
+
+
+def test_resample_same_rate_is_noop():
+    x = tone(440, 16000)
+    assert dsp.resample(x, 16000, 16000) is x
+
+
+@pytest.mark.parametrize('target', [22050, 16000, 8000, 48000])
+@pytest.mark.parametrize('cuts', [7, 300])
+def test_stream_resampler_matches_whole_signal(target, cuts):
+    x = tone(440, 24000).astype(np.float32)
+    resampler = dsp.StreamResampler(24000, target)
+    parts = [resampler.process(part) for part in np.array_split(x, cuts)] + [resampler.flush()]
+    y = np.concatenate(parts)
+    expected = dsp.resample(x, 24000, target)
+    assert len(y) == len(expected) == target
+    assert np.abs(y - expected).max() < 1e-5
+
+
+def test_stream_resampler_same_rate_passthrough():
+    resampler = dsp.StreamResampler(24000, 24000)
+    assert list(resampler.process([0.1, 0.2])) == pytest.approx([0.1, 0.2])
+    assert len(resampler.flush()) == 0
+
+
+@pytest.mark.parametrize('speed', [0.5, 0.8, 1.25, 2.0])
+def test_time_stretch_length_pitch_and_level(speed):
+    x = tone(220, 24000)
+    y = dsp.time_stretch(x, speed)
+    assert len(y) == round(len(x) / speed)
+    assert abs(peak_freq(y, 24000) - 220) < 3
+    # без подъёма уровня на краях
+    assert np.abs(y).max() < 0.6
+
+
+def test_time_stretch_short_input_unchanged():
+    x = np.zeros(100, dtype=np.float32)
+    assert len(dsp.time_stretch(x, 2.0)) == 100
+
+
+def square(freq, rate, seconds=1.0, amp=0.98):
+    return amp * np.sign(np.sin(2 * np.pi * freq * (np.arange(int(rate * seconds)) + 0.5) / rate))
+
+
+@pytest.mark.parametrize('speed,target_rate', [(0.5, None), (1.0, 48000), (0.8, 48000)])
+def test_encode_clips_overshoot(speed, target_rate, monkeypatch, tmp_path):
+    import routers
+    # encode пишет копию ответа в ./server.wav
+    monkeypatch.chdir(tmp_path)
+    x = dsp.time_stretch(square(220, 24000), speed)
+    expected = dsp.resample(x, 24000, target_rate) if target_rate else x
+    assert np.abs(expected).max() > 1.0
+    with wave.open(io.BytesIO(routers.encode(x, 24000, 'ru', target_rate))) as f:
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    loud = np.abs(expected) > 0.5
+    assert np.all(np.sign(pcm[loud]) == np.sign(expected[loud]))
+    assert np.abs(pcm).max() <= 32767
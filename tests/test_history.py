@@ -0,0 +1,66 @@
+import datetime
+import os
+
+import pytest
+
+import history
+
+
+@pytest.fixture
+def conn():
+    conn = history.connect(':memory:')
+    base = datetime.datetime(2026, 10, 19, 12, 0)
+    for i, text in enumerate(['Посадка на рейс 1016', 'Рейс задерживается', 'Багаж на ленте 3']):
+        history.add(conn, f'{i}.wav', text, 1.0, 'ru', base + datetime.timedelta(minutes=i))
+    return conn
+
+
+def test_page_newest_first_with_total(conn):
+    items, total = history.page(conn, offset=0, limit=2)
+    assert total == 3
+    assert [item['filename'] for item in items] == ['2.wav', '1.wav']
+    items, _ = history.page(conn, offset=2, limit=2)
+    assert [item['filename'] for item in items] == ['0.wav']
+
+
+def test_search_by_word_prefix(conn):
+    items, total = history.page(conn, 'рейс')
+    assert total == 2
+    items, total = history.page(conn, 'Посад')
+    assert total == 1 and items[0]['filename'] == '0.wav'
+
+
+@pytest.mark.parametrize('search', ['"', '.', '- ,', '  '])
+def test_search_without_words_returns_everything(conn, search):
+    assert history.page(conn, search)[1] == 3
+
+
+def test_add_is_idempotent_by_filename(conn):
+    history.add(conn, '0.wav', 'другой текст', 1.0, 'ru')
+    assert history.page(conn)[1] == 3
+
+
+def test_import_dir_once(tmp_path):
+    (tmp_path / 'a.wav').write_bytes(b'')
+    (tmp_path / 'a.txt').write_text('Старое объявление', encoding='utf-8')
+    (tmp_path / 'speed_a.txt').write_text('1.2', encoding='utf-8')
+    (tmp_path / 'b.wav').write_bytes(b'')
+    (tmp_path / 'notes.txt').write_text('не запись', encoding='utf-8')
+    conn = history.connect(':memory:')
+
+    def extract_time(name):
+        if name == 'a.wav':
+            return datetime.datetime(2026, 1, 1)
+        raise ValueError(name)
+    history.import_dir(conn, str(tmp_path), extract_time)
+    items, total = history.page(conn)
+    assert total == 2
+    by_name = {item['filename']: item for item in items}
+    assert by_name['a.wav']['text'] == 'Старое объявление' and by_name['a.wav']['speed'] == '1.2'
+    assert by_name['b.wav']['text'] == '-'
+    # время без имени в формате - mtime файла
+    assert by_name['b.wav']['created'] == datetime.datetime.fromtimestamp(
+        os.path.getmtime(tmp_path / 'b.wav')).isoformat()
+    (tmp_path / 'c.wav').write_bytes(b'')
+    history.import_dir(conn, str(tmp_path), extract_time)
+    assert history.page(conn)[1] == 2
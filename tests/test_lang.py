@@ -0,0 +1,16 @@
+import pytest
+
+import backends
+import config
+
+
+def test_check_lang():
+    config.check_lang('ru')
+    with pytest.raises(ValueError):
+        config.check_lang('xx')
+
+
+def test_no_backend_for_unknown_lang():
+    with pytest.raises(ValueError):
+        backends.get('random-garbage')
+    assert 'random-garbage' not in backends._backends
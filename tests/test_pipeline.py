@@ -0,0 +1,43 @@
+import pytest
+
+from pipeline import take_complete, split_long
+
+
+def test_take_complete_keeps_unfinished_tail():
+    assert take_complete('Первое. Второе. Трет', 'ru') == ('Первое. Второе. ', 'Трет')
+
+
+def test_take_complete_waits_for_space_after_dot():
+    # точка может оказаться частью числа: 3.5
+    assert take_complete('Рейс задерживается на 3.', 'ru') == ('', 'Рейс задерживается на 3.')
+    assert take_complete('Рейс задерживается на 3.5 часа. Ожид', 'ru') == ('Рейс задерживается на 3.5 часа. ', 'Ожид')
+
+
+def test_take_complete_other_separator():
+    assert take_complete('こんにちは。さよう', 'ja') == ('こんにちは。', 'さよう')
+
+
+def test_take_complete_nothing_finished():
+    assert take_complete('Уважаемые пассажиры', 'ru') == ('', 'Уважаемые пассажиры')
+
+
+def test_split_long_short_sentence_untouched():
+    assert split_long('Посадка окончена.', 100) == ['Посадка окончена.']
+
+
+def test_split_long_prefers_punctuation():
+    s = 'Уважаемые пассажиры, посадка на рейс 1016 окончена, выход номер 12 закрыт.'
+    assert split_long(s, 40) == ['Уважаемые пассажиры,', 'посадка на рейс 1016 окончена,', 'выход номер 12 закрыт.']
+
+
+@pytest.mark.parametrize('max_chars', [14, 25, 60])
+def test_split_long_respects_limit_and_keeps_words(max_chars):
+    s = ('Пассажиров с детьми до семи лет просим обращаться к представителю авиакомпании '
+         'для приоритетной посадки в самолёт; благодарим за внимание.')
+    parts = split_long(s, max_chars)
+    assert all(len(p) <= max_chars for p in parts)
+    assert ' '.join(parts).split() == s.split()
+
+
+def test_split_long_word_longer_than_limit_kept_whole():
+    assert split_long('Авиакомпания Аэрофлот', 8) == ['Авиакомпания', 'Аэрофлот']
@@ -0,0 +1,44 @@
+import datetime
+
+import prerender
+
+NOW = datetime.datetime(2026, 10, 19, 12, 0)
+
+
+def row(**fields):
+    base = {'flight': 'SU 1016', 'airline': 'Аэрофлот', 'destination': 'Калининград', 'gate': '12', 'langs': 'ru'}
+    return dict(base, **fields)
+
+
+def texts(rows):
+    return [text for text, _ in prerender.announcements(rows, now=NOW)]
+
+
+def test_only_flights_in_horizon_nearest_first():
+    rows = [
+        row(flight='LATE', departure=(NOW + datetime.timedelta(hours=2)).isoformat()),
+        row(flight='PAST', departure=(NOW - datetime.timedelta(hours=1)).isoformat()),
+        row(flight='SOON', departure=(NOW + datetime.timedelta(minutes=30)).isoformat()),
+        row(flight='FAR', departure=(NOW + datetime.timedelta(days=2)).isoformat()),
+    ]
+    result = texts(rows)
+    assert result and all('SOON' in t or 'LATE' in t for t in result)
+    assert 'SOON' in result[0]
+
+
+def test_templates_need_their_fields():
+    # без delay_until и belt/origin - только объявление о посадке
+    result = texts([row(departure=(NOW + datetime.timedelta(hours=1)).isoformat())])
+    assert len(result) == 1 and 'выход номер 12' in result[0]
+
+
+def test_time_with_offset():
+    when = (NOW + datetime.timedelta(hours=1)).astimezone(datetime.timezone(datetime.timedelta(hours=3)))
+    assert texts([row(departure=when.isoformat())])
+
+
+def test_bad_rows_are_skipped():
+    good = row(flight='GOOD', departure=(NOW + datetime.timedelta(hours=1)).isoformat())
+    bad = [row(departure='завтра'), row(), row(departure='')]
+    result = texts(bad + [good])
+    assert result and all('GOOD' in t for t in result)
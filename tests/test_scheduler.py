@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+import config
+from scheduler import Scheduler, QueueFull, DeadlineExceeded, priority
+
+
+def gate():
+    """Задача, занимающая воркер, пока не открыт release"""
+    started, release = threading.Event(), threading.Event()
+
+    def steps():
+        started.set()
+        release.wait(5)
+        yield [0.0]
+    return steps(), started, release
+
+
+def chunks(*wavs):
+    # задачи планировщика - генераторы, отменённые закрываются через close()
+    yield from wavs
+
+
+def job(name, order):
+    order.append(name)
+    yield [1.0]
+
+
+def test_result_is_concatenated_steps():
+    s = Scheduler(workers=1)
+    assert s.submit(chunks([1.0], [2.0, 3.0]), 1).result(5) == [1.0, 2.0, 3.0]
+
+
+def test_priority_order():
+    s = Scheduler(workers=1)
+    steps, started, release = gate()
+    s.submit(steps, 1)
+    started.wait(5)
+    order = []
+    low = s.submit(job('bulk', order), 2)
+    urgent = s.submit(job('urgent', order), 0)
+    release.set()
+    low.result(5)
+    urgent.result(5)
+    assert order == ['urgent', 'bulk']
+
+
+def test_queue_full_except_urgent():
+    s = Scheduler(workers=1, depth=1)
+    steps, started, release = gate()
+    s.submit(steps, 1)
+    started.wait(5)
+    with pytest.raises(QueueFull) as e:
+        s.submit(chunks([1.0]), 1)
+    assert e.value.retry_after >= 1
+    urgent = s.submit(chunks([1.0]), 0)
+    release.set()
+    assert urgent.result(5) == [1.0]
+
+
+def test_cancel_closes_steps():
+    s = Scheduler(workers=1)
+    steps, started, release = gate()
+    s.submit(steps, 1)
+    started.wait(5)
+    order = []
+    future = s.submit(job('cancelled', order), 1)
+    future.cancel()
+    release.set()
+    assert s.submit(chunks([1.0]), 1).result(5) == [1.0]
+    assert order == []
+
+
+def test_deadline():
+    s = Scheduler(workers=1)
+    future = s.submit(chunks([1.0]), 1, deadline=time.monotonic() - 1)
+    with pytest.raises(DeadlineExceeded):
+        future.result(5)
+
+
+def test_deadline_checked_between_steps():
+    s = Scheduler(workers=1)
+    order = []
+
+    def steps():
+        order.append(1)
+        yield [1.0]
+        time.sleep(0.1)
+        order.append(2)
+        yield [2.0]
+        order.append(3)
+        yield [3.0]
+    future = s.submit(steps(), 1, deadline=time.monotonic() + 0.05)
+    with pytest.raises(DeadlineExceeded):
+        future.result(5)
+    assert order == [1, 2]
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    monkeypatch.setattr(config, 'API_KEYS', {'fast': 'urgent', 'slow': 'bulk'})
+    monkeypatch.setattr(config, 'ADMIN_KEYS', {'admin'})
+
+
+def test_priority_defaults_to_key_class(keys):
+    assert priority(None) == config.PRIORITIES['normal']
+    assert priority(None, 'slow') == config.PRIORITIES['bulk']
+    assert priority(None, 'fast') == config.PRIORITIES['urgent']
+    assert priority(None, 'admin') == config.PRIORITIES['normal']
+
+
+def test_priority_explicit_urgent_needs_urgent_or_admin_key(keys):
+    assert priority('urgent', 'fast') == config.PRIORITIES['urgent']
+    assert priority('urgent', 'admin') == config.PRIORITIES['urgent']
+    for api_key in (None, 'unknown', 'slow'):
+        with pytest.raises(PermissionError):
+            priority('urgent', api_key)
+
+
+def test_priority_capped_at_key_class(keys):
+    assert priority('normal', 'slow') == config.PRIORITIES['bulk']
+    # понизить себя можно всегда
+    assert priority('bulk', None) == config.PRIORITIES['bulk']
+    assert priority('prerender', 'fast') == config.PRIORITIES['prerender']
+
+
+def test_priority_unknown_name(keys):
+    with pytest.raises(ValueError):
+        priority('asap')
+
+
+def test_promote_priority_and_deadline():
+    s = Scheduler(workers=1)
+    steps, started, release = gate()
+    s.submit(steps, 1)
+    started.wait(5)
+    order = []
+    bulk = s.submit(job('bulk', order), 2, deadline=time.monotonic() + 0.1)
+    normal = s.submit(job('normal', order), 1)
+    s.promote(bulk, 0, deadline=None)
+    time.sleep(0.2)
+    release.set()
+    assert bulk.result(5) == [1.0]
+    normal.result(5)
+    assert order == ['bulk', 'normal']
+
+
+def test_promote_never_demotes():
+    s = Scheduler(workers=1)
+    steps, started, release = gate()
+    s.submit(steps, 1)
+    started.wait(5)
+    order = []
+    urgent = s.submit(job('urgent', order), 0, deadline=time.monotonic() + 10)
+    normal = s.submit(job('normal', order), 1)
+    s.promote(urgent, 2, deadline=time.monotonic() + 1)
+    release.set()
+    urgent.result(5)
+    normal.result(5)
+    assert order == ['urgent', 'normal']
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+
+from singleflight import SingleFlight
+
+
+def submitter(calls):
+    def submit(on_chunk):
+        future = Future()
+        calls.append((future, on_chunk))
+        return future
+    return submit
+
+
+def test_identical_requests_share_one_job():
+    flights, calls, joined = SingleFlight(), [], []
+    first, shared = flights.join('k', submitter(calls))
+    assert not shared
+    second, shared = flights.join('k', submitter(calls), on_join=joined.append)
+    assert shared and second is first
+    assert len(calls) == 1 and joined == [first]
+
+
+def test_chunks_reach_late_subscribers():
+    flights, calls = SingleFlight(), []
+    flight, _ = flights.join('k', submitter(calls))
+    _, publish = calls[0]
+    publish([1.0])
+    seen = []
+    flight.subscribe(seen.extend)
+    publish([2.0])
+    assert seen == [1.0, 2.0] and flight.audio() == [1.0, 2.0]
+
+
+def test_done_job_is_forgotten():
+    flights, calls = SingleFlight(), []
+    flights.join('k', submitter(calls))
+    calls[0][0].set_result([])
+    _, shared = flights.join('k', submitter(calls))
+    assert not shared and len(calls) == 2
+
+
+def test_no_key_no_sharing():
+    flights, calls = SingleFlight(), []
+    flights.join(None, submitter(calls))
+    _, shared = flights.join(None, submitter(calls))
+    assert not shared and len(calls) == 2
+
+
+def test_job_cancelled_when_last_waiter_leaves():
+    flights, calls = SingleFlight(), []
+    flight, _ = flights.join('k', submitter(calls))
+    flights.join('k', submitter(calls))
+    flight.leave()
+    assert not flight.future.cancelled()
+    flight.leave()
+    assert flight.future.cancelled()
+    _, shared = flights.join('k', submitter(calls))
+    assert not shared